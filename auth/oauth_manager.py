@@ -1,9 +1,13 @@
+import functools
 import json
 import logging
 import os
+import tempfile
+import threading
 import time
 from pathlib import Path
 
+import orjson
 import requests
 
 logger = logging.getLogger(__name__)
@@ -16,6 +20,22 @@ TOKEN_REFRESH_BUFFER_SECONDS = 300
 # Alert when refresh token is older than 90 days (expires at 101)
 REFRESH_TOKEN_WARN_DAYS = 90
 
+# Coalesce bursts of Key Vault reads. Safe because OAuthManager checks
+# expiry against the `expires_at` stored inside the cached token data.
+KEYVAULT_CACHE_TTL_SECONDS = 10.0
+
+
+def _migrate(token_data: dict) -> dict:
+    """Backfill the absolute `expires_at` key from legacy `token_expiry`.
+
+    Token files written before `expires_at` existed only carry
+    `token_expiry` (same meaning: epoch seconds). Drop this fallback once
+    all stored tokens have been refreshed.
+    """
+    if "expires_at" not in token_data and "token_expiry" in token_data:
+        token_data["expires_at"] = token_data.pop("token_expiry")
+    return token_data
+
 
 class OAuthManager:
     """Manages QBO OAuth2 tokens with Key Vault or local file storage."""
@@ -24,6 +44,11 @@ class OAuthManager:
         self.settings = settings
         self.client_key = client_id
         self._storage = self._init_storage()
+        # In-memory token cache so each QBO request doesn't hit storage
+        self._cached = None
+        self._cached_expiry = 0
+        self._realm_id = None
+        self._refresh_lock = threading.Lock()
 
     def _init_storage(self):
         if self.settings.TOKEN_STORAGE == "keyvault":
@@ -33,22 +58,62 @@ class OAuthManager:
         return LocalTokenStorage(self.settings.LOCAL_TOKEN_DIR, self.client_key)
 
     def get_valid_access_token(self) -> str:
-        """Return a valid access token, refreshing if expired."""
-        token_data = self._storage.load()
-        expiry = token_data.get("token_expiry", 0)
+        """Return a valid access token, refreshing if expired.
+
+        Safe to call from concurrent extraction threads: the fast path is
+        lock-free, and only one thread performs the refresh. QBO rotates the
+        refresh token on every exchange, so parallel refreshes would leave
+        the stored token invalid.
+        """
+        if self._cache_is_fresh():
+            return self._cached["access_token"]
+
+        with self._refresh_lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._cache_is_fresh():
+                return self._cached["access_token"]
 
-        if time.time() > expiry - TOKEN_REFRESH_BUFFER_SECONDS:
-            logger.info(f"Access token expired for {self.client_key}, refreshing...")
-            self._refresh_token(token_data)
             token_data = self._storage.load()
+            expiry = token_data.get("expires_at", 0)
+
+            if time.time() > expiry - TOKEN_REFRESH_BUFFER_SECONDS:
+                logger.info(f"Access token expired for {self.client_key}, refreshing...")
+                token_data = self._refresh_token(token_data)
 
-        self._check_refresh_token_age(token_data)
-        return token_data["access_token"]
+            self._check_refresh_token_age(token_data)
+            self._set_cache(token_data)
+            return token_data["access_token"]
+
+    def refresh_if_expiring(self, within_seconds: float) -> bool:
+        """Refresh the stored tokens if the access token expires soon.
+
+        Used by the scheduled refresh job so pipeline runs start with a
+        fresh access token. Returns True if a refresh was performed.
+        """
+        with self._refresh_lock:
+            token_data = self._storage.load()
+            if time.time() <= token_data.get("expires_at", 0) - within_seconds:
+                self._set_cache(token_data)
+                return False
+            token_data = self._refresh_token(token_data)
+            self._check_refresh_token_age(token_data)
+            return True
 
     def get_realm_id(self) -> str:
         """Return the QBO realm ID (company ID) for this client."""
-        token_data = self._storage.load()
-        return token_data["realm_id"]
+        if self._realm_id is None:
+            # Realm ID never changes for a client, so load it once
+            self._realm_id = self._storage.load()["realm_id"]
+        return self._realm_id
+
+    def _cache_is_fresh(self) -> bool:
+        return bool(self._cached) and (
+            time.time() < self._cached_expiry - TOKEN_REFRESH_BUFFER_SECONDS
+        )
+
+    def _set_cache(self, token_data: dict):
+        self._cached = token_data
+        self._cached_expiry = token_data.get("expires_at", 0)
 
     def store_initial_tokens(
         self,
@@ -57,20 +122,28 @@ class OAuthManager:
         realm_id: str,
         expires_in: int = 3600,
     ):
-        """Store tokens from initial OAuth authorization flow."""
-        self._storage.save(
-            {
-                "access_token": access_token,
-                "refresh_token": refresh_token,
-                "realm_id": realm_id,
-                "token_expiry": time.time() + expires_in,
-                "refresh_token_issued": time.time(),
-            }
-        )
+        """Store tokens from initial OAuth authorization flow.
+
+        `expires_in` is relative to issuance, so it is converted to an
+        absolute `expires_at` here and never re-applied after loading.
+        """
+        token_data = {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "realm_id": realm_id,
+            "expires_at": time.time() + expires_in,
+            "refresh_token_issued": time.time(),
+        }
+        self._storage.save(token_data)
+        self._set_cache(token_data)
+        self._realm_id = realm_id
         logger.info(f"Stored initial tokens for {self.client_key}")
 
-    def _refresh_token(self, token_data: dict):
-        """Exchange refresh token for new access + refresh tokens."""
+    def _refresh_token(self, token_data: dict) -> dict:
+        """Exchange refresh token for new access + refresh tokens.
+
+        Updates token_data in place, saves it, and returns it.
+        """
         refresh_token = token_data["refresh_token"]
 
         response = requests.post(
@@ -87,11 +160,13 @@ class OAuthManager:
 
         token_data["access_token"] = tokens["access_token"]
         token_data["refresh_token"] = tokens["refresh_token"]
-        token_data["token_expiry"] = time.time() + tokens["expires_in"]
+        token_data["expires_at"] = time.time() + tokens["expires_in"]
         token_data["refresh_token_issued"] = time.time()
         self._storage.save(token_data)
+        self._set_cache(token_data)
 
         logger.info(f"Refreshed tokens for {self.client_key}")
+        return token_data
 
     def _check_refresh_token_age(self, token_data: dict):
         """Warn if refresh token is approaching its 101-day expiry."""
@@ -121,39 +196,66 @@ class LocalTokenStorage:
                 f"Expected: {self.token_file}"
             )
         with open(self.token_file) as f:
-            return json.load(f)
+            return _migrate(json.load(f))
 
     def save(self, token_data: dict):
-        with open(self.token_file, "w") as f:
-            json.dump(token_data, f, indent=2)
+        # Write to a temp file and swap it in, so a crash mid-write can't
+        # leave a truncated token file behind
+        fd, tmp_path = tempfile.mkstemp(dir=self.token_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(token_data, f, indent=2)
+            os.replace(tmp_path, self.token_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+@functools.lru_cache(maxsize=1)
+def _get_credential():
+    """Shared AAD credential; it caches access tokens internally."""
+    from azure.identity import DefaultAzureCredential
+
+    return DefaultAzureCredential()
+
+
+@functools.lru_cache(maxsize=8)
+def _get_secret_client(vault_url: str):
+    """Return a shared SecretClient per vault."""
+    from azure.keyvault.secrets import SecretClient
+
+    return SecretClient(vault_url=vault_url, credential=_get_credential())
 
 
 class KeyVaultTokenStorage:
     """Store OAuth tokens in Azure Key Vault (for production)."""
 
     def __init__(self, vault_url: str, client_key: str):
-        from azure.identity import DefaultAzureCredential
-        from azure.keyvault.secrets import SecretClient
-
-        self.client = SecretClient(
-            vault_url=vault_url, credential=DefaultAzureCredential()
-        )
+        self.client = _get_secret_client(vault_url)
         self.prefix = client_key
+        self._cache = None
+        self._cache_expires = 0.0
 
     def _secret_name(self, key: str) -> str:
         # Key Vault secret names: alphanumeric and hyphens only
         return f"{self.prefix}-{key}".replace("_", "-")
 
     def load(self) -> dict:
+        if self._cache is not None and time.time() < self._cache_expires:
+            return dict(self._cache)
         try:
             secret = self.client.get_secret(self._secret_name("token-data"))
-            return json.loads(secret.value)
+            token_data = _migrate(orjson.loads(secret.value))
         except Exception as e:
             raise FileNotFoundError(
                 f"No tokens in Key Vault for {self.prefix}: {e}"
             )
+        self._cache = token_data
+        self._cache_expires = time.time() + KEYVAULT_CACHE_TTL_SECONDS
+        return dict(token_data)
 
     def save(self, token_data: dict):
+        self._cache = None
         self.client.set_secret(
             self._secret_name("token-data"), json.dumps(token_data)
         )
@@ -119,18 +119,22 @@ def run_oauth_flow(settings: Settings, client_id: str):
     response.raise_for_status()
     tokens = response.json()
 
+    # expires_in is relative to issuance; OAuthManager converts it to an
+    # absolute expires_at at write time
+    expires_in = tokens.get("expires_in", 3600)
+
     # Store tokens
     oauth = OAuthManager(settings, client_id)
     oauth.store_initial_tokens(
         access_token=tokens["access_token"],
         refresh_token=tokens["refresh_token"],
         realm_id=realm_id,
-        expires_in=tokens.get("expires_in", 3600),
+        expires_in=expires_in,
     )
 
     print(f"Tokens stored successfully for client: {client_id}")
     print(f"  Realm ID: {realm_id}")
-    print(f"  Access token expires in: {tokens.get('expires_in', 3600)}s")
+    print(f"  Access token expires in: {expires_in}s")
     print(f"  Refresh token expires in: {tokens.get('x_refresh_token_expires_in', 8726400)}s")
 
     return realm_id
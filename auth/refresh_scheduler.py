@@ -0,0 +1,49 @@
+"""Scheduled OAuth token refresh, run ahead of the daily pipeline.
+
+Refreshing here keeps the token exchange off the pipeline's critical
+path: each client's run starts with a stored access token that is still
+valid. OAuthManager still refreshes inline if a token expires mid-run.
+"""
+
+import logging
+from pathlib import Path
+
+import orjson
+
+from auth.oauth_manager import OAuthManager
+
+logger = logging.getLogger(__name__)
+
+CLIENTS_FILE = Path("config/clients.json")
+
+# Refresh any access token that would expire before the pipeline is under
+# way: the job runs at 10:30 UTC, 30 minutes before the 11:00 ETL, plus 15
+# minutes of slack. Tokens refreshed within the last 15 minutes (QBO access
+# tokens last 60) are left alone.
+REFRESH_WINDOW_SECONDS = 45 * 60
+
+
+def refresh_tokens_job(settings) -> int:
+    """Refresh tokens for every active client that needs it.
+
+    A failure for one client is logged and does not stop the others.
+    Returns the number of clients whose tokens were refreshed.
+    """
+    if not CLIENTS_FILE.exists():
+        logger.error(f"Clients file not found: {CLIENTS_FILE}")
+        return 0
+
+    refreshed = 0
+    for client in orjson.loads(CLIENTS_FILE.read_bytes()):
+        client_id = client.get("client_id", "?")
+        if not client.get("is_active", True):
+            continue
+        try:
+            oauth = OAuthManager(settings, client_id)
+            if oauth.refresh_if_expiring(REFRESH_WINDOW_SECONDS):
+                refreshed += 1
+        except Exception as e:
+            logger.error(f"Token refresh failed for {client_id}: {e}", exc_info=True)
+
+    logger.info(f"Refreshed tokens for {refreshed} client(s)")
+    return refreshed
@@ -1,3 +1,5 @@
+from datetime import date
+
 from pydantic_settings import BaseSettings
 
 
@@ -13,12 +15,22 @@ class Settings(BaseSettings):
     QBO_MINOR_VERSION: int = 75
     QBO_MAX_RESULTS: int = 1000
     QBO_RATE_LIMIT_PER_MIN: int = 500
+    QBO_MAX_CONCURRENCY: int = 8  # Parallel QBO requests per client
+    MAX_CLIENTS_CONCURRENT: int = 4  # Clients processed in parallel
+    PARALLEL_MAP_MIN_RECORDS: int = 0  # Map tables this large in worker processes; 0 disables
+    FLATTEN_CHUNK_RECORDS: int = 50_000  # Line-item tables load in chunks this size; 0 disables
 
     # Azure Key Vault
     AZURE_KEY_VAULT_URL: str = ""
 
     # Azure SQL Database
     AZURE_SQL_CONNECTION_STRING: str = ""
+    AZURE_SQL_DRIVER: str = "pyodbc"  # "pyodbc" or "mssql-python"
+    SQL_BATCH_SIZE: int = 10000  # Rows per staging insert batch
+    # Load large staging tables with BULK INSERT from a CSV in Blob Storage.
+    # Needs an external data source whose LOCATION is the storage container.
+    USE_BULK_INSERT: bool = False
+    AZURE_SQL_BULK_DATA_SOURCE: str = ""
 
     # Azure Blob Storage
     AZURE_STORAGE_CONNECTION_STRING: str = ""
@@ -29,5 +41,18 @@ class Settings(BaseSettings):
     LOCAL_TOKEN_DIR: str = "data/tokens"
     LOCAL_DB_PATH: str = "data/dev.db"
     DB_BACKEND: str = "sqlite"  # "sqlite" or "azure_sql"
+    ENTITY_CACHE_DIR: str = ""  # Parquet entity cache for replays; empty disables it
+    USE_ADBC: bool = False  # Load SQLite via Arrow/ADBC (needs adbc-driver-sqlite)
+    USE_ARROW_DTYPES: bool = False  # pyarrow-backed columns in transforms (needs pyarrow)
 
     model_config = {"env_file": ".env", "extra": "ignore"}
+
+
+def default_fiscal_range() -> tuple[str, str]:
+    """Return (start_date, end_date) for the default report window: YTD.
+
+    Compute once per pipeline run so every report shares the same window,
+    even if the run straddles midnight.
+    """
+    today = date.today()
+    return f"{today.year}-01-01", today.isoformat()
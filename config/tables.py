@@ -1,3 +1,5 @@
+from types import MappingProxyType
+
 # QBO entity tables pulled via SELECT * FROM {Table}
 ENTITY_TABLES = [
     # Original 12 tables from existing QB Pull.py
@@ -40,65 +42,66 @@ TABLES_WITH_LINE_ITEMS = {
     "RefundReceipt": "SalesItemLineDetail",
 }
 
-# Report endpoints (GET requests with query parameters, different from entity queries)
+# Report endpoints (GET requests with query parameters, different from entity queries).
+# default_params are read-only; build per-call params with {**default_params, ...}
 REPORT_ENDPOINTS = {
     "ProfitAndLoss": {
         "path": "/reports/ProfitAndLoss",
-        "default_params": {
+        "default_params": MappingProxyType({
             "accounting_method": "Accrual",
             "summarize_column_by": "Month",
-        },
+        }),
     },
     "ProfitAndLossCash": {
         "path": "/reports/ProfitAndLoss",
-        "default_params": {
+        "default_params": MappingProxyType({
             "accounting_method": "Cash",
             "summarize_column_by": "Month",
-        },
+        }),
     },
     "BalanceSheet": {
         "path": "/reports/BalanceSheet",
-        "default_params": {
+        "default_params": MappingProxyType({
             "accounting_method": "Accrual",
-        },
+        }),
     },
     "CashFlow": {
         "path": "/reports/CashFlow",
-        "default_params": {
+        "default_params": MappingProxyType({
             "summarize_column_by": "Month",
-        },
+        }),
     },
     "AgedReceivables": {
         "path": "/reports/AgedReceivables",
-        "default_params": {
+        "default_params": MappingProxyType({
             "aging_period": "30",
             "num_periods": "4",
-        },
+        }),
     },
     "AgedReceivableDetail": {
         "path": "/reports/AgedReceivableDetail",
-        "default_params": {
+        "default_params": MappingProxyType({
             "aging_period": "30",
             "num_periods": "4",
-        },
+        }),
     },
     "AgedPayables": {
         "path": "/reports/AgedPayables",
-        "default_params": {
+        "default_params": MappingProxyType({
             "aging_period": "30",
             "num_periods": "4",
-        },
+        }),
     },
     "AgedPayableDetail": {
         "path": "/reports/AgedPayableDetail",
-        "default_params": {
+        "default_params": MappingProxyType({
             "aging_period": "30",
             "num_periods": "4",
-        },
+        }),
     },
     "TrialBalance": {
         "path": "/reports/TrialBalance",
-        "default_params": {},
+        "default_params": MappingProxyType({}),
     },
 }
 
@@ -0,0 +1,84 @@
+"""Local Parquet cache of extracted QBO entities for retries and replay."""
+
+import logging
+import os
+import shutil
+import time
+from datetime import date
+from pathlib import Path
+
+import orjson
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Cached tables older than this are ignored and re-extracted
+CACHE_TTL_SECONDS = 3600
+
+# Cache location used by backfill when ENTITY_CACHE_DIR isn't set
+DEFAULT_CACHE_DIR = "data/entity_cache"
+
+
+def save_entities(settings, client_id: str, table_name: str, records: list[dict]):
+    """Write one entity table's raw records to the cache.
+
+    QBO records are ragged nested objects that don't round-trip through
+    Arrow structs, so each record is stored as a JSON string in a single
+    zstd-compressed Parquet column. Only today's directory is kept; earlier
+    days for the client are deleted. Failures are logged, not raised: the
+    cache is an optimization and must never fail a pipeline run.
+    """
+    if not settings.ENTITY_CACHE_DIR or not records:
+        return
+    cache_dir = _cache_dir(settings, client_id)
+    path = cache_dir / f"{table_name}.parquet"
+    try:
+        _prune_old_days(cache_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".parquet.tmp")
+        pd.DataFrame(
+            {"record": [orjson.dumps(r, default=str).decode("utf-8") for r in records]}
+        ).to_parquet(tmp_path, compression="zstd", index=False)
+        os.replace(tmp_path, path)
+        logger.debug(f"Cached {table_name} to {path}")
+    except Exception as e:
+        logger.warning(f"Could not cache {table_name}: {e}")
+
+
+def load_entities(
+    settings, client_id: str, max_age: float = CACHE_TTL_SECONDS
+) -> dict[str, list[dict]]:
+    """Load today's cached entity tables for a client.
+
+    Returns {table_name: [records...]} for every table cached within
+    max_age seconds. Empty if nothing usable is cached.
+    """
+    cache_dir = _cache_dir(settings, client_id)
+    if not settings.ENTITY_CACHE_DIR or not cache_dir.is_dir():
+        return {}
+
+    now = time.time()
+    results = {}
+    for path in sorted(cache_dir.glob("*.parquet")):
+        if now - path.stat().st_mtime > max_age:
+            continue
+        try:
+            column = pd.read_parquet(path, columns=["record"])["record"]
+            results[path.stem] = [orjson.loads(r) for r in column]
+        except Exception as e:
+            logger.warning(f"Could not read cached {path.stem}: {e}")
+    return results
+
+
+def _cache_dir(settings, client_id: str) -> Path:
+    """Return the cache directory for a client and today's date."""
+    return Path(settings.ENTITY_CACHE_DIR) / client_id / date.today().isoformat()
+
+
+def _prune_old_days(cache_dir: Path):
+    """Delete a client's cache directories for days other than cache_dir's."""
+    if not cache_dir.parent.is_dir():
+        return
+    for day_dir in cache_dir.parent.iterdir():
+        if day_dir.is_dir() and day_dir.name != cache_dir.name:
+            shutil.rmtree(day_dir, ignore_errors=True)
@@ -1,4 +1,6 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator
 
 from config.tables import ENTITY_TABLES
 from extract.qbo_client import QBOClient
@@ -6,32 +8,55 @@ from extract.qbo_client import QBOClient
 logger = logging.getLogger(__name__)
 
 
+def iter_entities(
+    qbo: QBOClient, tables: list[str] = ENTITY_TABLES
+) -> Iterator[tuple[str, list[dict]]]:
+    """Extract entity tables (default: all) from QBO, yielding each as it completes.
+
+    Tables are fetched concurrently (bounded by QBO_MAX_CONCURRENCY); the
+    shared rate limiter in QBOClient keeps the total request rate in check.
+    Extraction keeps running in the background while the caller processes
+    each yielded table, so downstream work overlaps with API latency.
+
+    Yields (table_name, records) tuples in completion order. A table that
+    fails to extract yields an empty list. Closing the generator early
+    cancels extractions that haven't started yet.
+    """
+    workers = max(1, qbo.settings.QBO_MAX_CONCURRENCY)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {
+            pool.submit(extract_entity, qbo, table): table
+            for table in tables
+        }
+        for future in as_completed(futures):
+            table = futures[future]
+            try:
+                records = future.result()
+            except Exception as e:
+                logger.error(f"Failed to extract {table}: {e}")
+                records = []
+            yield table, records
+    finally:
+        # If the consumer stops early (e.g. a load failed), don't wait for
+        # the remaining tables: drop queued extractions and return at once
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
 def extract_all_entities(qbo: QBOClient) -> dict[str, list[dict]]:
     """Extract all entity tables from QBO.
 
     Returns a dict of {table_name: [records...]}.
     """
-    results = {}
-    for table in ENTITY_TABLES:
-        logger.info(f"Extracting entity: {table}")
-        try:
-            if table == "CompanyInfo":
-                # CompanyInfo uses a different endpoint (GET by ID)
-                info = qbo.get_company_info()
-                results[table] = [info] if info else []
-            else:
-                records = qbo.query_all(table)
-                results[table] = records
-        except Exception as e:
-            logger.error(f"Failed to extract {table}: {e}")
-            results[table] = []
-    return results
+    results = dict(iter_entities(qbo))
+    return {table: results[table] for table in ENTITY_TABLES}
 
 
 def extract_entity(qbo: QBOClient, table: str) -> list[dict]:
     """Extract a single entity table from QBO."""
     logger.info(f"Extracting entity: {table}")
     if table == "CompanyInfo":
+        # CompanyInfo uses a different endpoint (GET by ID)
         info = qbo.get_company_info()
         return [info] if info else []
     return qbo.query_all(table)
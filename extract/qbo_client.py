@@ -1,6 +1,9 @@
 import logging
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
+import orjson
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -14,30 +17,105 @@ class QBOClient:
     def __init__(self, oauth_manager, settings):
         self.oauth = oauth_manager
         self.settings = settings
-        self._request_timestamps = []
+        # Token bucket: refills at QBO_RATE_LIMIT_PER_MIN per minute. Burst
+        # is capped at one second's worth so any 60s window stays at the limit
+        self._rate = settings.QBO_RATE_LIMIT_PER_MIN / 60.0
+        self._bucket_capacity = max(1.0, self._rate)
+        self._tokens = self._bucket_capacity
+        self._last_refill = time.monotonic()
+        self._rate_lock = threading.Lock()
+        # In-flight requests keyed by request identity, so concurrent
+        # duplicates wait for the first call instead of re-fetching
+        self._inflight: dict[tuple, Future] = {}
+        self._inflight_lock = threading.Lock()
+        # Every HTTP request holds one slot, so QBO_MAX_CONCURRENCY caps the
+        # requests in flight for this client however the callers fan out
+        # (tables x pages, parallel reports). The token bucket above only
+        # paces request starts.
+        self._max_concurrency = max(1, settings.QBO_MAX_CONCURRENCY)
+        self._request_slots = threading.BoundedSemaphore(self._max_concurrency)
 
         # Configure session with retry logic
         self.session = requests.Session()
+        # On 429, QBO's Retry-After tells us when the limit clears; the
+        # jittered exponential backoff only applies when it's absent
         retries = Retry(
-            total=3,
-            backoff_factor=1,
+            total=5,
+            backoff_factor=0.5,
+            backoff_jitter=0.5,
             status_forcelist=[429, 500, 502, 503, 504],
             allowed_methods=["GET", "POST"],
+            respect_retry_after_header=True,
         )
-        self.session.mount("https://", HTTPAdapter(max_retries=retries))
+        # One pooled connection per request slot
+        self.session.mount(
+            "https://",
+            HTTPAdapter(
+                max_retries=retries,
+                pool_connections=self._max_concurrency,
+                pool_maxsize=self._max_concurrency,
+            ),
+        )
+
+    def close(self):
+        """Release pooled connections."""
+        self.session.close()
 
     def _rate_limit(self):
-        """Enforce QBO rate limit (default 500 requests/minute)."""
-        now = time.time()
-        self._request_timestamps = [
-            t for t in self._request_timestamps if now - t < 60
-        ]
-        if len(self._request_timestamps) >= self.settings.QBO_RATE_LIMIT_PER_MIN:
-            sleep_time = 60 - (now - self._request_timestamps[0])
-            if sleep_time > 0:
-                logger.info(f"Rate limit reached, sleeping {sleep_time:.1f}s")
+        """Enforce QBO rate limit (default 500 requests/minute).
+
+        Shared across worker threads, so concurrent extraction stays under
+        the per-company limit.
+        """
+        with self._rate_lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._bucket_capacity,
+                self._tokens + (now - self._last_refill) * self._rate,
+            )
+            self._last_refill = now
+            if self._tokens < 1:
+                sleep_time = (1 - self._tokens) / self._rate
+                logger.debug(f"Rate limit reached, sleeping {sleep_time:.2f}s")
                 time.sleep(sleep_time)
-        self._request_timestamps.append(time.time())
+                self._tokens = 1.0
+                self._last_refill = time.monotonic()
+            self._tokens -= 1
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send one rate-limited request while holding a concurrency slot."""
+        with self._request_slots:
+            self._rate_limit()
+            response = self.session.request(method, url, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def _single_flight(self, key: tuple, fetch):
+        """Run fetch() once per key among concurrent callers.
+
+        Callers that arrive while a request for the same key is in flight
+        block on its result (or exception) instead of issuing their own.
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            result = fetch()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
 
     def _get_headers(self) -> dict:
         return {
@@ -52,68 +130,97 @@ class QBOClient:
             f"/company/{realm_id}"
         )
 
+    def _run_query(self, query_str: str) -> dict:
+        """POST a QBO SQL-style query and return the QueryResponse body."""
+        url = f"{self._base_url()}/query"
+        headers = self._get_headers()
+        headers["Content-Type"] = "application/text"
+
+        params = {"minorversion": self.settings.QBO_MINOR_VERSION}
+
+        response = self._request(
+            "POST", url, headers=headers, data=query_str, params=params, timeout=60
+        )
+        return orjson.loads(response.content).get("QueryResponse", {})
+
     def query(self, table: str, start_position: int = 1) -> list[dict]:
         """Query a QBO entity table with a single page."""
-        self._rate_limit()
-        url = f"{self._base_url()}/query"
         query_str = (
             f"SELECT * FROM {table} "
             f"STARTPOSITION {start_position} "
             f"MAXRESULTS {self.settings.QBO_MAX_RESULTS}"
         )
-        headers = self._get_headers()
-        headers["Content-Type"] = "application/text"
-
-        params = {"minorversion": self.settings.QBO_MINOR_VERSION}
-
-        response = self.session.post(
-            url, headers=headers, data=query_str, params=params, timeout=60
+        return self._single_flight(
+            ("query", table, start_position),
+            lambda: self._run_query(query_str).get(table, []),
         )
-        response.raise_for_status()
-        return response.json().get("QueryResponse", {}).get(table, [])
 
-    def query_all(self, table: str) -> list[dict]:
-        """Paginate through all records for an entity table."""
-        all_records = []
-        start = 1
-        page = 1
+    def count(self, table: str) -> int:
+        """Return the total number of records in an entity table."""
+        return self._run_query(f"SELECT COUNT(*) FROM {table}").get("totalCount", 0)
 
-        while True:
-            logger.debug(f"  {table} page {page} (start={start})")
+    def query_all(self, table: str) -> list[dict]:
+        """Fetch all records for an entity table.
+
+        Uses a COUNT query to size the page list up front, then fetches the
+        pages concurrently. If the table grew after the count, any extra
+        pages are fetched sequentially; if the COUNT query itself fails,
+        every page is.
+        """
+        max_results = self.settings.QBO_MAX_RESULTS
+        try:
+            total = self.count(table)
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"  {table}: COUNT query failed ({e}), paging sequentially")
+            total = 0
+        starts = list(range(1, total + 1, max_results)) or [1]
+        logger.debug(f"  {table}: {total} records in {len(starts)} page(s)")
+
+        workers = max(1, min(len(starts), self.settings.QBO_MAX_CONCURRENCY))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pages = list(
+                pool.map(lambda s: self.query(table, start_position=s), starts)
+            )
+
+        all_records = [record for batch in pages for record in batch]
+
+        # Records added since the count: keep paging while pages come back full
+        start = starts[-1]
+        batch = pages[-1]
+        while len(batch) == max_results:
+            start += max_results
+            logger.debug(f"  {table} extra page (start={start})")
             batch = self.query(table, start_position=start)
-            if not batch:
-                break
             all_records.extend(batch)
-            if len(batch) < self.settings.QBO_MAX_RESULTS:
-                break
-            start += self.settings.QBO_MAX_RESULTS
-            page += 1
 
         logger.info(f"  {table}: {len(all_records)} records")
         return all_records
 
     def get_report(self, report_path: str, params: dict = None) -> dict:
         """Fetch a QBO report endpoint (GET request)."""
-        self._rate_limit()
-        url = f"{self._base_url()}{report_path}"
-        query_params = params or {}
-        query_params["minorversion"] = self.settings.QBO_MINOR_VERSION
+        query_params = {
+            **(params or {}),
+            "minorversion": self.settings.QBO_MINOR_VERSION,
+        }
 
-        response = self.session.get(
-            url, headers=self._get_headers(), params=query_params, timeout=60
+        def fetch() -> dict:
+            url = f"{self._base_url()}{report_path}"
+            response = self._request(
+                "GET", url, headers=self._get_headers(), params=query_params, timeout=60
+            )
+            return orjson.loads(response.content)
+
+        return self._single_flight(
+            ("report", report_path, frozenset(query_params.items())), fetch
         )
-        response.raise_for_status()
-        return response.json()
 
     def get_company_info(self) -> dict:
         """Fetch company info (special endpoint: GET by ID)."""
-        self._rate_limit()
         realm_id = self.oauth.get_realm_id()
         url = f"{self._base_url()}/companyinfo/{realm_id}"
         params = {"minorversion": self.settings.QBO_MINOR_VERSION}
 
-        response = self.session.get(
-            url, headers=self._get_headers(), params=params, timeout=30
+        response = self._request(
+            "GET", url, headers=self._get_headers(), params=params, timeout=30
         )
-        response.raise_for_status()
-        return response.json().get("CompanyInfo", {})
+        return orjson.loads(response.content).get("CompanyInfo", {})
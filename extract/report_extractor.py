@@ -1,5 +1,8 @@
+import functools
 import logging
-from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
 
 from config.tables import REPORT_ENDPOINTS
 from extract.qbo_client import QBOClient
@@ -9,37 +12,33 @@ logger = logging.getLogger(__name__)
 
 def extract_all_reports(
     qbo: QBOClient,
-    start_date: str = None,
-    end_date: str = None,
+    start_date: str,
+    end_date: str,
 ) -> dict[str, dict]:
     """Extract all report endpoints from QBO.
 
     Args:
-        start_date: Start date in YYYY-MM-DD format. Defaults to Jan 1 of current year.
-        end_date: End date in YYYY-MM-DD format. Defaults to today.
+        start_date: Start date in YYYY-MM-DD format.
+        end_date: End date in YYYY-MM-DD format.
+
+    See config.settings.default_fiscal_range for the standard YTD window.
 
     Returns a dict of {report_name: raw_report_json}.
     """
-    today = date.today()
-    if not start_date:
-        start_date = f"{today.year}-01-01"
-    if not end_date:
-        end_date = today.isoformat()
+    # Reports are independent GETs, so fetch them concurrently
+    workers = max(1, qbo.settings.QBO_MAX_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            report_name: pool.submit(
+                extract_report, qbo, report_name, start_date, end_date
+            )
+            for report_name in REPORT_ENDPOINTS
+        }
 
     results = {}
-    for report_name, config in REPORT_ENDPOINTS.items():
-        logger.info(f"Extracting report: {report_name}")
+    for report_name, future in futures.items():
         try:
-            params = dict(config["default_params"])
-            # Reports that use date ranges
-            if report_name not in ("BalanceSheet",):
-                params["start_date"] = start_date
-                params["end_date"] = end_date
-            else:
-                # Balance sheet is point-in-time
-                params["date"] = end_date
-            report_data = qbo.get_report(config["path"], params)
-            results[report_name] = report_data
+            results[report_name] = future.result()
         except Exception as e:
             logger.error(f"Failed to extract report {report_name}: {e}")
             results[report_name] = {}
@@ -49,8 +48,8 @@ def extract_all_reports(
 def extract_report(
     qbo: QBOClient,
     report_name: str,
-    start_date: str = None,
-    end_date: str = None,
+    start_date: str,
+    end_date: str,
 ) -> dict:
     """Extract a single report from QBO."""
     if report_name not in REPORT_ENDPOINTS:
@@ -59,38 +58,87 @@ def extract_report(
             f"Available: {list(REPORT_ENDPOINTS.keys())}"
         )
 
-    today = date.today()
-    if not start_date:
-        start_date = f"{today.year}-01-01"
-    if not end_date:
-        end_date = today.isoformat()
-
     config = REPORT_ENDPOINTS[report_name]
-    params = dict(config["default_params"])
-
-    if report_name not in ("BalanceSheet",):
-        params["start_date"] = start_date
-        params["end_date"] = end_date
-    else:
-        params["date"] = end_date
+    params = dict(_report_params(report_name, start_date, end_date))
 
     logger.info(f"Extracting report: {report_name} ({start_date} to {end_date})")
     return qbo.get_report(config["path"], params)
 
 
+@functools.lru_cache(maxsize=256)
+def _report_params(report_name: str, start_date: str, end_date: str) -> tuple:
+    """Build the query params for a report as a hashable tuple of items."""
+    default_params = REPORT_ENDPOINTS[report_name]["default_params"]
+    if report_name not in ("BalanceSheet",):
+        params = {**default_params, "start_date": start_date, "end_date": end_date}
+    else:
+        # Balance sheet is point-in-time
+        params = {**default_params, "date": end_date}
+    return tuple(params.items())
+
+
 def flatten_report_rows(report_data: dict) -> list[dict]:
     """Flatten QBO report JSON into a list of row dicts.
 
     QBO reports have a nested structure with Header, Columns, and Rows.
     This flattens it into tabular format suitable for loading into SQL.
     """
+    columns, rows = _flatten_report(report_data)
+    if len(set(columns)) == len(columns):
+        return [dict(zip(columns, row)) for row in rows]
+
+    # Repeated column titles: the last value actually present wins
+    flat = []
+    for row in rows:
+        values = {}
+        for col, value in zip(columns, row):
+            if value is not None or col not in values:
+                values[col] = value
+        flat.append(values)
+    return flat
+
+
+# Metadata columns appended to every flattened report row
+REPORT_META_COLUMNS = ["_section", "_row_type", "_report_name"]
+
+
+def flatten_report_rows_df(report_data: dict) -> pd.DataFrame:
+    """Flatten QBO report JSON directly into a DataFrame.
+
+    Same rows as flatten_report_rows, but built from row tuples with a
+    fixed column order (report columns, then metadata), so no per-row
+    dicts are created.
+    """
+    columns, rows = _flatten_report(report_data)
+    if not rows:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(rows, columns=columns)
+    if df.columns.has_duplicates:
+        # Repeated column titles: combine right to left so the last value
+        # actually present wins, as with dict rows (a short ColData row
+        # leaves the later duplicates null)
+        positions = {}
+        for i, col in enumerate(columns):
+            positions.setdefault(col, []).append(i)
+        df = pd.DataFrame({
+            col: (
+                df.iloc[:, idx].ffill(axis=1).iloc[:, -1]
+                if len(idx) > 1
+                else df.iloc[:, idx[0]]
+            )
+            for col, idx in positions.items()
+        })
+    return df
+
+
+def _flatten_report(report_data: dict) -> tuple[list[str], list[tuple]]:
+    """Return (column names, row tuples) for a QBO report."""
     if not report_data:
-        return []
+        return [], []
 
     header = report_data.get("Header", {})
     report_name = header.get("ReportName", "Unknown")
-    report_date = header.get("StartPeriod", "")
-    end_date = header.get("EndPeriod", "")
 
     # Get column headers
     columns = report_data.get("Columns", {}).get("Column", [])
@@ -104,18 +152,51 @@ def flatten_report_rows(report_data: dict) -> list[dict]:
         report_name,
         section="",
     )
-    return rows
+    return col_names + REPORT_META_COLUMNS, rows
 
 
 def _extract_rows(
     row_list: list,
-    output: list[dict],
+    output: list[tuple],
     col_names: list[str],
     report_name: str,
     section: str,
 ):
-    """Recursively extract rows from QBO report nested structure."""
-    for row in row_list:
+    """Extract rows from QBO report nested structure.
+
+    Each row is emitted as a tuple of the report column values followed by
+    (section, row type, report name); columns with no ColData are None.
+
+    Walks sections depth-first with an explicit stack (instead of
+    recursion) so deeply nested reports can't hit the recursion limit.
+    Output order matches a recursive walk: a section's rows are followed
+    by its Summary row.
+    """
+    n_cols = len(col_names)
+    output_append = output.append
+
+    def row_values(col_data: list) -> list:
+        values = [None] * n_cols
+        for i, cd in enumerate(col_data[:n_cols]):
+            values[i] = cd.get("value", "")
+        return values
+
+    # Each frame: (row iterator, section name, Summary to emit when exhausted)
+    stack = [(iter(row_list), section, None)]
+    while stack:
+        rows, current_section, pending_summary = stack[-1]
+        row = next(rows, None)
+
+        if row is None:
+            stack.pop()
+            # Also capture the Summary row if present
+            if pending_summary:
+                values = row_values(pending_summary.get("ColData", []))
+                output_append(
+                    (*values, current_section, "Summary", report_name)
+                )
+            continue
+
         row_type = row.get("type", "")
 
         if row_type == "Section":
@@ -126,32 +207,10 @@ def _extract_rows(
                 if col_data:
                     section_name = col_data[0].get("value", "")
 
-            # Recurse into section rows
+            # Descend into section rows
             sub_rows = row.get("Rows", {}).get("Row", [])
-            _extract_rows(sub_rows, output, col_names, report_name, section_name)
-
-            # Also capture the Summary row if present
-            summary = row.get("Summary", {})
-            if summary:
-                col_data = summary.get("ColData", [])
-                values = {
-                    col_names[i]: cd.get("value", "")
-                    for i, cd in enumerate(col_data)
-                    if i < len(col_names)
-                }
-                values["_section"] = section_name
-                values["_row_type"] = "Summary"
-                values["_report_name"] = report_name
-                output.append(values)
+            stack.append((iter(sub_rows), section_name, row.get("Summary", {})))
 
         elif row_type == "Data" or "ColData" in row:
-            col_data = row.get("ColData", [])
-            values = {
-                col_names[i]: cd.get("value", "")
-                for i, cd in enumerate(col_data)
-                if i < len(col_names)
-            }
-            values["_section"] = section
-            values["_row_type"] = "Data"
-            values["_report_name"] = report_name
-            output.append(values)
+            values = row_values(row.get("ColData", []))
+            output_append((*values, current_section, "Data", report_name))
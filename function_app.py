@@ -4,12 +4,34 @@ import logging
 
 import azure.functions as func
 
-from config.settings import Settings
+from auth.refresh_scheduler import refresh_tokens_job
+from config.settings import Settings, default_fiscal_range
+from load.raw_archiver import ensure_archive_container
 from orchestrator.pipeline import run_pipeline_all_clients
 
 app = func.FunctionApp()
 
 
+@app.timer_trigger(
+    schedule="0 30 10 * * *",  # Daily at 10:30 UTC, 30 min before the ETL
+    arg_name="timer",
+    run_on_startup=False,
+)
+def refresh_qbo_tokens(timer: func.TimerRequest) -> None:
+    """Refresh QBO OAuth tokens so the daily ETL starts with valid ones."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    logger = logging.getLogger(__name__)
+
+    try:
+        refresh_tokens_job(Settings())
+    except Exception as e:
+        # The ETL still refreshes inline, so this run failing is not fatal
+        logger.error(f"Scheduled token refresh failed: {e}", exc_info=True)
+
+
 @app.timer_trigger(
     schedule="0 0 11 * * *",  # Daily at 11:00 UTC (6:00 AM ET)
     arg_name="timer",
@@ -30,7 +52,8 @@ def daily_qbo_etl(timer: func.TimerRequest) -> None:
 
     try:
         settings = Settings()
-        run_pipeline_all_clients(settings)
+        ensure_archive_container(settings)
+        run_pipeline_all_clients(settings, default_fiscal_range())
         logger.info("Daily QBO ETL completed successfully")
     except Exception as e:
         logger.error(f"Daily QBO ETL failed: {e}", exc_info=True)
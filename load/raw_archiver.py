@@ -1,10 +1,12 @@
 """Archive raw QBO API JSON responses for auditability and replay."""
 
-import json
+import functools
 import logging
 from datetime import datetime
 from pathlib import Path
 
+import orjson
+
 logger = logging.getLogger(__name__)
 
 
@@ -21,7 +23,8 @@ def archive_raw_json(
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     blob_path = f"{client_id}/{source_name}/{timestamp}.json"
 
-    json_bytes = json.dumps(data, default=str, indent=2).encode("utf-8")
+    # orjson encodes straight to compact bytes (no intermediate str)
+    json_bytes = orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
 
     if settings.TOKEN_STORAGE == "keyvault":
         _archive_to_blob(settings, blob_path, json_bytes)
@@ -38,23 +41,35 @@ def _archive_to_local(settings, blob_path: str, data: bytes):
     logger.debug(f"Archived to {file_path}")
 
 
-def _archive_to_blob(settings, blob_path: str, data: bytes):
-    """Upload raw JSON to Azure Blob Storage."""
+@functools.lru_cache(maxsize=8)
+def _get_blob_service(connection_string: str):
+    """Return a shared BlobServiceClient (one TLS session per account)."""
     from azure.storage.blob import BlobServiceClient
 
-    blob_service = BlobServiceClient.from_connection_string(
-        settings.AZURE_STORAGE_CONNECTION_STRING
-    )
-    container_client = blob_service.get_container_client(
-        settings.AZURE_STORAGE_CONTAINER
-    )
+    return BlobServiceClient.from_connection_string(connection_string)
+
+
+def ensure_archive_container(settings):
+    """Create the raw archive container if it doesn't exist.
 
-    # Create container if it doesn't exist
+    Call once at pipeline startup rather than on every archive write.
+    """
+    if settings.TOKEN_STORAGE != "keyvault":
+        return
+    container_client = _get_blob_service(
+        settings.AZURE_STORAGE_CONNECTION_STRING
+    ).get_container_client(settings.AZURE_STORAGE_CONTAINER)
     try:
         container_client.create_container()
     except Exception:
         pass  # Container already exists
 
-    blob_client = container_client.get_blob_client(blob_path)
-    blob_client.upload_blob(data, overwrite=True)
+
+def _archive_to_blob(settings, blob_path: str, data: bytes):
+    """Upload raw JSON to Azure Blob Storage."""
+    blob_client = _get_blob_service(
+        settings.AZURE_STORAGE_CONNECTION_STRING
+    ).get_blob_client(settings.AZURE_STORAGE_CONTAINER, blob_path)
+    # Large archives are split into blocks and uploaded in parallel
+    blob_client.upload_blob(data, overwrite=True, max_concurrency=4)
     logger.debug(f"Archived to blob: {blob_path}")
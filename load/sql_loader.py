@@ -1,13 +1,57 @@
 """Load transformed DataFrames into Azure SQL or local SQLite."""
 
+import functools
+import io
 import logging
+import re
 import sqlite3
+import uuid
+from itertools import islice
 from pathlib import Path
 
+import numpy as np
+import orjson
 import pandas as pd
 
 logger = logging.getLogger(__name__)
 
+# Primary key columns per target table
+PK_MAP = {
+    "dim_account": ["client_id", "account_id"],
+    "dim_customer": ["client_id", "customer_id"],
+    "dim_vendor": ["client_id", "vendor_id"],
+    "dim_item": ["client_id", "item_id"],
+    "dim_employee": ["client_id", "employee_id"],
+    "dim_class": ["client_id", "id"],
+    "dim_department": ["client_id", "id"],
+    "dim_tax_code": ["client_id", "id"],
+    "dim_tax_rate": ["client_id", "id"],
+    "dim_term": ["client_id", "id"],
+    "dim_payment_method": ["client_id", "id"],
+    "dim_company_info": ["client_id", "id"],
+    "fact_invoice": ["client_id", "invoice_id"],
+    "fact_invoice_line": ["client_id", "invoice_id", "line_id"],
+    "fact_bill": ["client_id", "bill_id"],
+    "fact_bill_line": ["client_id", "bill_id", "line_id"],
+    "fact_payment": ["client_id", "payment_id"],
+    "fact_payment_line": ["client_id", "payment_id", "linked_invoice_id"],
+    "fact_purchase": ["client_id", "purchase_id"],
+    "fact_purchase_line": ["client_id", "purchase_id", "line_id"],
+    "fact_estimate": ["client_id", "estimate_id"],
+    "fact_estimate_line": ["client_id", "estimate_id", "line_id"],
+    "fact_bill_payment": ["client_id", "id"],
+    "fact_deposit": ["client_id", "id"],
+    "fact_credit_memo": ["client_id", "id"],
+    "fact_refund_receipt": ["client_id", "id"],
+    "fact_sales_receipt": ["client_id", "id"],
+    "fact_journal_entry": ["client_id", "id"],
+    "fact_transfer": ["client_id", "id"],
+}
+DEFAULT_PK = ["client_id", "id"]
+
+# T-SQL batch separator: GO alone on a line (any case, CRLF or LF)
+_GO_RE = re.compile(r"(?im)^\s*GO\s*$")
+
 
 class SQLLoader:
     """Upsert DataFrames into SQL database (Azure SQL or SQLite)."""
@@ -16,31 +60,83 @@ class SQLLoader:
         self.settings = settings
         self.client_id = client_id
         self.backend = settings.DB_BACKEND
+        # One connection per loader, reused across upserts
+        self._conn = None
+        self._adbc_conn = None
+        # Persistent Azure SQL staging tables: {name: {column: type}}
+        self._staging_schemas = None
+
+    def _get_conn(self):
+        """Return the cached connection, opening it on first use."""
+        if self._conn is None:
+            if self.backend == "sqlite":
+                self._conn = self._get_sqlite_conn()
+            else:
+                self._conn = self._get_azure_sql_conn()
+        return self._conn
+
+    def close(self):
+        """Close the cached connections, if open."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._adbc_conn is not None:
+            self._adbc_conn.close()
+            self._adbc_conn = None
 
     def _get_sqlite_conn(self):
         db_path = Path(self.settings.LOCAL_DB_PATH)
         db_path.parent.mkdir(parents=True, exist_ok=True)
-        return sqlite3.connect(str(db_path))
+        # Generous busy timeout: parallel client runs share one dev DB file
+        conn = sqlite3.connect(str(db_path), timeout=60)
+        # WAL + NORMAL sync: far fewer fsyncs, still crash-safe for dev use
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-200000")  # ~200 MB page cache
+        return conn
+
+    def _get_adbc_sqlite_conn(self):
+        """Return the cached ADBC SQLite connection, opening it on first use."""
+        if self._adbc_conn is None:
+            import adbc_driver_sqlite.dbapi
+
+            db_path = Path(self.settings.LOCAL_DB_PATH)
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = adbc_driver_sqlite.dbapi.connect(str(db_path))
+            with conn.cursor() as cursor:
+                cursor.execute("PRAGMA busy_timeout=60000")
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+            self._adbc_conn = conn
+        return self._adbc_conn
 
     def _get_azure_sql_conn(self):
+        # Explicit transactions: each upsert commits exactly once, after
+        # its MERGE, so there is a single log flush per table
+        if self.settings.AZURE_SQL_DRIVER == "mssql-python":
+            import mssql_python
+
+            return mssql_python.connect(
+                self.settings.AZURE_SQL_CONNECTION_STRING, autocommit=False
+            )
+
         import pyodbc
 
-        return pyodbc.connect(self.settings.AZURE_SQL_CONNECTION_STRING)
+        return pyodbc.connect(
+            self.settings.AZURE_SQL_CONNECTION_STRING, autocommit=False
+        )
 
     def upsert(self, table_name: str, df: pd.DataFrame):
         """Insert or replace rows into the target table.
 
-        Adds client_id column automatically. For SQLite uses INSERT OR REPLACE.
+        Adds client_id column automatically (prepended to each row as it is
+        written, so df is never copied). For SQLite uses INSERT OR REPLACE.
         For Azure SQL uses MERGE.
         """
         if df.empty:
             logger.info(f"  {table_name}: no data to load")
             return
 
-        # Add client_id to every row
-        df = df.copy()
-        df.insert(0, "client_id", self.client_id)
-
         if self.backend == "sqlite":
             self._upsert_sqlite(table_name, df)
         else:
@@ -49,142 +145,553 @@ class SQLLoader:
         logger.info(f"  {table_name}: loaded {len(df)} rows")
 
     def _upsert_sqlite(self, table_name: str, df: pd.DataFrame):
-        """Upsert into SQLite using INSERT OR REPLACE."""
-        conn = self._get_sqlite_conn()
+        """Upsert into SQLite using INSERT OR REPLACE.
+
+        Creates the table from the DataFrame's dtypes if it doesn't exist
+        and adds any new columns. Tables without a usable primary key (e.g.
+        report snapshots) have this client's existing rows replaced.
+        """
+        if self.settings.USE_ADBC:
+            self._upsert_sqlite_adbc(table_name, df)
+            return
+
+        columns = ["client_id"] + df.columns.tolist()
+        has_pk = self._has_pk(table_name, columns)
+        rows = _to_rows(df, self.client_id)
+
+        conn = self._get_conn()
+        with conn:  # single transaction, committed on success
+            cursor = conn.cursor()
+            self._sync_sqlite_schema(cursor, table_name, df)
+            if not has_pk:
+                cursor.execute(
+                    f"DELETE FROM [{table_name}] WHERE client_id = ?",
+                    (self.client_id,),
+                )
+            cursor.executemany(_insert_or_replace_sql(table_name, tuple(columns)), rows)
+
+    def _upsert_sqlite_adbc(self, table_name: str, df: pd.DataFrame):
+        """Upsert into SQLite through ADBC.
+
+        The frame is converted to Arrow and ingested into a temp staging
+        table in one call (no per-cell Python objects or bound parameters),
+        then copied into the target with INSERT OR REPLACE ... SELECT.
+        """
+        import pyarrow as pa
+
+        columns = ["client_id"] + df.columns.tolist()
+        has_pk = self._has_pk(table_name, columns)
+        data = pa.Table.from_pandas(df, preserve_index=False)
+        # Categorical columns arrive dictionary-encoded; ingest plain values
+        data = data.cast(pa.schema([
+            field.with_type(field.type.value_type)
+            if pa.types.is_dictionary(field.type) else field
+            for field in data.schema
+        ]))
+        data = data.add_column(
+            0, "client_id", pa.array([self.client_id] * len(df), pa.string())
+        )
+        staging_table = f"staging_{table_name}"
+        col_list = ", ".join(f"[{c}]" for c in columns)
+
+        conn = self._get_adbc_sqlite_conn()
         try:
-            # Create table if not exists (auto-infer schema from DataFrame)
-            df.to_sql(
-                table_name,
-                conn,
-                if_exists="replace",
-                index=False,
-                method="multi",
-            )
-        finally:
-            conn.close()
+            with conn.cursor() as cursor:
+                self._sync_sqlite_schema(cursor, table_name, df)
+                cursor.execute(f"DROP TABLE IF EXISTS temp.[{staging_table}]")
+                cursor.adbc_ingest(staging_table, data, mode="create", temporary=True)
+                if not has_pk:
+                    cursor.execute(
+                        f"DELETE FROM [{table_name}] WHERE client_id = ?",
+                        (self.client_id,),
+                    )
+                cursor.execute(
+                    f"INSERT OR REPLACE INTO [{table_name}] ({col_list}) "
+                    f"SELECT {col_list} FROM temp.[{staging_table}]"
+                )
+                cursor.execute(f"DROP TABLE temp.[{staging_table}]")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _has_pk(self, table_name: str, columns: list[str]) -> bool:
+        """Whether every primary key column for the table is present."""
+        return all(col in columns for col in self._get_pk_columns(table_name))
+
+    def _sync_sqlite_schema(self, cursor, table_name: str, df: pd.DataFrame):
+        """Create the target table if needed and add any missing columns.
+
+        A table that exists without the expected primary key (e.g. one
+        written by the old to_sql loader) is rebuilt with it, since
+        INSERT OR REPLACE only replaces rows on a key conflict.
+        """
+        columns = ["client_id"] + df.columns.tolist()
+        col_types = {"client_id": "TEXT"}
+        col_types.update({col: _sqlite_type(df[col].dtype) for col in df.columns})
+        pk_cols = self._get_pk_columns(table_name)
+        has_pk = self._has_pk(table_name, columns)
+
+        col_defs = ", ".join(f"[{col}] {col_types[col]}" for col in columns)
+        if has_pk:
+            col_defs += f", PRIMARY KEY ({', '.join(f'[{c}]' for c in pk_cols)})"
+
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS [{table_name}] ({col_defs})")
+        cursor.execute(f"PRAGMA table_info([{table_name}])")
+        table_info = cursor.fetchall()
+        # {column: declared type} in table order; pk is the 1-based key position
+        existing = {row[1]: row[2] for row in table_info}
+        table_pk = [row[1] for row in sorted(table_info, key=lambda row: row[5]) if row[5]]
+        for col in columns:
+            if col not in existing:
+                cursor.execute(
+                    f"ALTER TABLE [{table_name}] ADD COLUMN "
+                    f"[{col}] {col_types[col]}"
+                )
+                existing[col] = col_types[col]
+
+        if has_pk and table_pk != pk_cols:
+            _rebuild_sqlite_table(cursor, table_name, existing, pk_cols)
 
     def _upsert_azure_sql(self, table_name: str, df: pd.DataFrame):
-        """Upsert into Azure SQL using a staging table + MERGE."""
-        conn = self._get_azure_sql_conn()
+        """Upsert into Azure SQL with a MERGE.
+
+        Frames that fit in one batch are shipped as a single JSON parameter
+        and merged straight from OPENJSON (one round-trip, no staging
+        table). Larger frames are bulk loaded into a persistent
+        per-client staging table first; it is emptied again in the same
+        transaction as the MERGE, so no client data stays in staging
+        outside the client_id-scoped target tables.
+        """
+        conn = self._get_conn()
         cursor = conn.cursor()
-        staging_table = f"staging_{table_name}"
+        staging_table = _staging_table_name(table_name, self.client_id)
+        columns = ["client_id"] + df.columns.tolist()
+        col_types = {"client_id": "NVARCHAR(255)"}
+        col_types.update({col: _sql_server_type(df[col]) for col in df.columns})
+        rows = _to_rows(df, self.client_id)
 
         try:
-            # 1. Create staging table (temp)
-            columns = df.columns.tolist()
-            col_defs = ", ".join(
-                f"[{col}] NVARCHAR(MAX)" for col in columns
-            )
+            if len(df) <= self.settings.SQL_BATCH_SIZE:
+                # Rows are JSON arrays; map each column by position
+                json_cols = ", ".join(
+                    f"[{col}] {col_types[col]} '$[{i}]'"
+                    for i, col in enumerate(columns)
+                )
+                source = f"(SELECT * FROM OPENJSON(?) WITH ({json_cols}))"
+                cursor.execute(
+                    _merge_sql(table_name, tuple(columns), source),
+                    orjson.dumps(rows, default=str).decode("utf-8"),
+                )
+                conn.commit()
+                return
+
+            # 1. Empty (or create) the staging table
+            self._prepare_staging(cursor, staging_table, columns, col_types)
+
+            # 2. Bulk insert into staging, in batches to bound memory
+            if self.settings.USE_BULK_INSERT:
+                self._bulk_insert_staging(cursor, staging_table, rows)
+            else:
+                for chunk in _iter_chunks(rows, self.settings.SQL_BATCH_SIZE):
+                    self._bulk_load(cursor, staging_table, columns, chunk)
+
+            # 3. MERGE into target, then empty staging before committing
             cursor.execute(
-                f"IF OBJECT_ID('tempdb..#{staging_table}') IS NOT NULL "
-                f"DROP TABLE #{staging_table}"
+                _merge_sql(table_name, tuple(columns), f"[{staging_table}]")
             )
-            cursor.execute(f"CREATE TABLE #{staging_table} ({col_defs})")
-
-            # 2. Bulk insert into staging
-            placeholders = ", ".join(["?"] * len(columns))
-            insert_sql = (
-                f"INSERT INTO #{staging_table} "
-                f"({', '.join(f'[{c}]' for c in columns)}) "
-                f"VALUES ({placeholders})"
-            )
-            for _, row in df.iterrows():
-                values = [
-                    str(v) if pd.notna(v) else None for v in row.values
-                ]
-                cursor.execute(insert_sql, values)
-
-            # 3. MERGE into target
-            pk_cols = self._get_pk_columns(table_name)
-            join_condition = " AND ".join(
-                f"target.[{col}] = source.[{col}]" for col in pk_cols
-            )
-            update_cols = [c for c in columns if c not in pk_cols]
-            update_set = ", ".join(
-                f"target.[{col}] = source.[{col}]" for col in update_cols
-            )
-            insert_cols = ", ".join(f"[{c}]" for c in columns)
-            insert_vals = ", ".join(f"source.[{c}]" for c in columns)
-
-            merge_sql = f"""
-                MERGE [{table_name}] AS target
-                USING #{staging_table} AS source
-                ON {join_condition}
-                WHEN MATCHED THEN
-                    UPDATE SET {update_set}
-                WHEN NOT MATCHED THEN
-                    INSERT ({insert_cols})
-                    VALUES ({insert_vals});
-            """
-            cursor.execute(merge_sql)
-            conn.commit()
-
-            # 4. Clean up staging
-            cursor.execute(f"DROP TABLE #{staging_table}")
+            cursor.execute(f"TRUNCATE TABLE [{staging_table}]")
             conn.commit()
 
-        except Exception as e:
+        except Exception:
             conn.rollback()
+            # Staging DDL may have been rolled back; re-read it next time
+            self._staging_schemas = None
             raise
         finally:
             cursor.close()
-            conn.close()
 
-    def _get_pk_columns(self, table_name: str) -> list[str]:
-        """Return primary key columns for a table."""
-        pk_map = {
-            "dim_account": ["client_id", "account_id"],
-            "dim_customer": ["client_id", "customer_id"],
-            "dim_vendor": ["client_id", "vendor_id"],
-            "dim_item": ["client_id", "item_id"],
-            "dim_employee": ["client_id", "employee_id"],
-            "dim_class": ["client_id", "id"],
-            "dim_department": ["client_id", "id"],
-            "dim_tax_code": ["client_id", "id"],
-            "dim_tax_rate": ["client_id", "id"],
-            "dim_term": ["client_id", "id"],
-            "dim_payment_method": ["client_id", "id"],
-            "dim_company_info": ["client_id", "id"],
-            "fact_invoice": ["client_id", "invoice_id"],
-            "fact_invoice_line": ["client_id", "invoice_id", "line_id"],
-            "fact_bill": ["client_id", "bill_id"],
-            "fact_bill_line": ["client_id", "bill_id", "line_id"],
-            "fact_payment": ["client_id", "payment_id"],
-            "fact_payment_line": ["client_id", "payment_id", "linked_invoice_id"],
-            "fact_purchase": ["client_id", "purchase_id"],
-            "fact_purchase_line": ["client_id", "purchase_id", "line_id"],
-            "fact_estimate": ["client_id", "estimate_id"],
-            "fact_bill_payment": ["client_id", "id"],
-            "fact_deposit": ["client_id", "id"],
-            "fact_credit_memo": ["client_id", "id"],
-            "fact_refund_receipt": ["client_id", "id"],
-            "fact_sales_receipt": ["client_id", "id"],
-            "fact_journal_entry": ["client_id", "id"],
-            "fact_transfer": ["client_id", "id"],
-        }
-        return pk_map.get(table_name, ["client_id", "id"])
+    def _prepare_staging(
+        self, cursor, staging_table: str, columns: list[str], col_types: dict
+    ):
+        """Make the persistent staging table empty and ready for this load.
 
-    def execute_sql_file(self, sql_file_path: str):
-        """Execute a .sql file against the database."""
-        with open(sql_file_path) as f:
-            sql = f.read()
+        Staging tables are kept between runs (empty: each load truncates
+        its table after the MERGE), which avoids DDL (schema locks, catalog
+        writes) on every upsert. They are only recreated when their columns
+        can't hold the incoming frame.
+        Existing staging schemas are read once per loader.
+        """
+        if self._staging_schemas is None:
+            self._staging_schemas = _read_staging_schemas(cursor)
 
-        if self.backend == "sqlite":
-            conn = self._get_sqlite_conn()
+        wanted = {col: col_types[col] for col in columns}
+        existing = self._staging_schemas.get(staging_table)
+        if existing is not None and _staging_fits(existing, wanted):
+            cursor.execute(f"TRUNCATE TABLE [{staging_table}]")
+            return
+
+        col_defs = ", ".join(f"[{col}] {col_type}" for col, col_type in wanted.items())
+        cursor.execute(f"DROP TABLE IF EXISTS [{staging_table}]")
+        cursor.execute(f"CREATE TABLE [{staging_table}] ({col_defs})")
+        self._staging_schemas[staging_table] = wanted
+
+    def _bulk_load(self, cursor, table_name: str, columns: list[str], rows: list):
+        """Bulk load rows into a table (normally a staging table).
+
+        With the mssql-python driver, uses the TDS bulk load protocol
+        (cursor.bulkcopy), which streams rows like bcp/SqlBulkCopy without
+        per-statement parsing. Otherwise uses pyodbc fast_executemany.
+        """
+        if self.settings.AZURE_SQL_DRIVER == "mssql-python":
             try:
-                conn.executescript(sql)
-            finally:
-                conn.close()
+                cursor.bulkcopy(table_name, columns=columns, rows=rows)
+                return
+            except AttributeError:
+                logger.warning(
+                    "cursor.bulkcopy not available in this mssql-python "
+                    "version, falling back to executemany"
+                )
+        else:
+            # Send parameter arrays in one round-trip instead of one per row
+            cursor.fast_executemany = True
+
+        placeholders = ", ".join(["?"] * len(columns))
+        insert_sql = (
+            f"INSERT INTO [{table_name}] "
+            f"({', '.join(f'[{c}]' for c in columns)}) "
+            f"VALUES ({placeholders})"
+        )
+        cursor.executemany(insert_sql, rows)
+
+    def _bulk_insert_staging(self, cursor, staging_table: str, rows: list):
+        """Load the staging table with BULK INSERT from Blob Storage.
+
+        Rows are written to an in-memory CSV, uploaded to the storage
+        container and parsed server-side by BULK INSERT through the
+        external data source named in AZURE_SQL_BULK_DATA_SOURCE (its
+        LOCATION must be the container URL). No per-row parameter binding
+        or round-trips. The CSV blob is deleted afterwards.
+        """
+        from load.raw_archiver import _get_blob_service
+
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(",".join(map(_csv_field, row)))
+            buffer.write("\n")
+        blob_path = f"_bulk/{self.client_id}/{staging_table}_{uuid.uuid4().hex}.csv"
+        blob_client = _get_blob_service(
+            self.settings.AZURE_STORAGE_CONNECTION_STRING
+        ).get_blob_client(self.settings.AZURE_STORAGE_CONTAINER, blob_path)
+        blob_client.upload_blob(
+            buffer.getvalue().encode("utf-8"), overwrite=True, max_concurrency=4
+        )
+        try:
+            # Unquoted empty fields load as NULL (KEEPNULLS); strings are
+            # always quoted, so '' stays an empty string
+            cursor.execute(
+                f"BULK INSERT [{staging_table}] FROM '{blob_path}' "
+                f"WITH (DATA_SOURCE = '{self.settings.AZURE_SQL_BULK_DATA_SOURCE}', "
+                f"FORMAT = 'CSV', CODEPAGE = '65001', KEEPNULLS, TABLOCK)"
+            )
+        finally:
+            blob_client.delete_blob()
+
+    def replace_table(self, table_name: str, df: pd.DataFrame):
+        """Replace every row of a shared (not per-client) table, e.g. dim_date.
+
+        The delete and the insert run in one transaction, with all rows
+        bound in a single executemany (bulk load on Azure SQL).
+        """
+        columns = df.columns.tolist()
+        values = df.to_numpy(dtype=object)
+        values[df.isna().to_numpy()] = None
+        rows = values.tolist()
+
+        conn = self._get_conn()
+        if self.backend == "sqlite":
+            with conn:
+                conn.execute(f"DELETE FROM [{table_name}]")
+                conn.executemany(
+                    _insert_or_replace_sql(table_name, tuple(columns)), rows
+                )
         else:
-            conn = self._get_azure_sql_conn()
             cursor = conn.cursor()
             try:
-                # Split on GO statements for Azure SQL
-                for batch in sql.split("\nGO\n"):
-                    batch = batch.strip()
-                    if batch:
-                        cursor.execute(batch)
+                cursor.execute(f"DELETE FROM [{table_name}]")
+                self._bulk_load(cursor, table_name, columns, rows)
                 conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
             finally:
                 cursor.close()
-                conn.close()
+
+        logger.info(f"  {table_name}: replaced with {len(df)} rows")
+
+    def _get_pk_columns(self, table_name: str) -> list[str]:
+        """Return primary key columns for a table."""
+        return PK_MAP.get(table_name, DEFAULT_PK)
+
+    def execute_sql_file(self, sql_file_path: str):
+        """Execute a .sql file against the database.
+
+        The file is streamed line by line and each statement (SQLite) or
+        GO-separated batch (Azure SQL) is executed as soon as it is
+        complete, so the whole script is never held in memory. On Azure
+        SQL all batches run in the connection's one open transaction,
+        committed at the end.
+        """
+        conn = self._get_conn()
+        if self.backend == "sqlite":
+            with open(sql_file_path) as f, conn:
+                for statement in _iter_sqlite_statements(f):
+                    conn.execute(statement)
+            return
+
+        cursor = conn.cursor()
+        try:
+            with open(sql_file_path) as f:
+                for batch in _iter_go_batches(f):
+                    cursor.execute(batch)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+@functools.lru_cache(maxsize=256)
+def _merge_sql(table_name: str, columns: tuple[str, ...], source: str) -> str:
+    """Build a MERGE of `source` (table or derived table) into the target.
+
+    Cached per (table, columns, source): the same tables are merged with
+    the same column sets on every run.
+    """
+    pk_cols = PK_MAP.get(table_name, DEFAULT_PK)
+    join_condition = " AND ".join(
+        f"target.[{col}] = source.[{col}]" for col in pk_cols
+    )
+    update_cols = [c for c in columns if c not in pk_cols]
+    update_set = ", ".join(
+        f"target.[{col}] = source.[{col}]" for col in update_cols
+    )
+    insert_cols = ", ".join(f"[{c}]" for c in columns)
+    insert_vals = ", ".join(f"source.[{c}]" for c in columns)
+
+    return f"""
+        MERGE [{table_name}] AS target
+        USING {source} AS source
+        ON {join_condition}
+        WHEN MATCHED THEN
+            UPDATE SET {update_set}
+        WHEN NOT MATCHED THEN
+            INSERT ({insert_cols})
+            VALUES ({insert_vals});
+    """
+
+
+@functools.lru_cache(maxsize=256)
+def _insert_or_replace_sql(table_name: str, columns: tuple[str, ...]) -> str:
+    """Build the SQLite INSERT OR REPLACE statement for a column set."""
+    placeholders = ", ".join(["?"] * len(columns))
+    return (
+        f"INSERT OR REPLACE INTO [{table_name}] "
+        f"({', '.join(f'[{c}]' for c in columns)}) "
+        f"VALUES ({placeholders})"
+    )
+
+
+def _rebuild_sqlite_table(cursor, table_name: str, col_types: dict[str, str], pk_cols: list[str]):
+    """Recreate a SQLite table with the given primary key, keeping its rows.
+
+    Rows are copied in insertion order with INSERT OR REPLACE, so where
+    the old table holds duplicate keys the most recently written row wins.
+    """
+    logger.info(f"  {table_name}: rebuilding with primary key {pk_cols}")
+    rebuilt = f"{table_name}__rebuild"
+    col_defs = ", ".join(f"[{col}] {col_type}" for col, col_type in col_types.items())
+    col_defs += f", PRIMARY KEY ({', '.join(f'[{c}]' for c in pk_cols)})"
+    col_list = ", ".join(f"[{col}]" for col in col_types)
+    cursor.execute(f"DROP TABLE IF EXISTS [{rebuilt}]")
+    cursor.execute(f"CREATE TABLE [{rebuilt}] ({col_defs})")
+    cursor.execute(
+        f"INSERT OR REPLACE INTO [{rebuilt}] ({col_list}) "
+        f"SELECT {col_list} FROM [{table_name}] ORDER BY rowid"
+    )
+    cursor.execute(f"DROP TABLE [{table_name}]")
+    cursor.execute(f"ALTER TABLE [{rebuilt}] RENAME TO [{table_name}]")
+
+
+def _to_rows(df: pd.DataFrame, client_id: str) -> list[list]:
+    """Convert a frame to row lists of native Python values, client_id first.
+
+    Nulls are found with one vectorized mask over the whole frame and
+    replaced with None, instead of a pd.notna() call per cell.
+    """
+    values = np.empty((len(df), len(df.columns) + 1), dtype=object)
+    values[:, 0] = client_id
+    values[:, 1:] = df.to_numpy(dtype=object)
+    values[:, 1:][df.isna().to_numpy()] = None
+    return values.tolist()
+
+
+def _csv_field(value) -> str:
+    """Format one value for the BULK INSERT CSV.
+
+    None is an unquoted empty field (NULL); every string is quoted, so an
+    empty string stays distinct from NULL. Booleans are written as 1/0,
+    which is what BIT columns accept in character format.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    if isinstance(value, (bool, np.bool_)):
+        return "1" if value else "0"
+    return str(value)
+
+
+def _staging_table_name(table_name: str, client_id: str) -> str:
+    """Per-client staging table name, so parallel clients never collide."""
+    safe_client_id = re.sub(r"\W", "_", client_id)
+    return f"staging_{table_name}__{safe_client_id}"
+
+
+def _read_staging_schemas(cursor) -> dict[str, dict[str, str]]:
+    """Read the column types of every existing staging table."""
+    cursor.execute(
+        "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH "
+        "FROM INFORMATION_SCHEMA.COLUMNS "
+        "WHERE TABLE_SCHEMA = SCHEMA_NAME() AND TABLE_NAME LIKE 'staging[_]%' "
+        "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+    )
+    schemas = {}
+    for table, column, data_type, max_len in cursor.fetchall():
+        col_type = data_type.upper()
+        if col_type == "NVARCHAR":
+            col_type = f"NVARCHAR({'MAX' if max_len == -1 else max_len})"
+        schemas.setdefault(table, {})[column] = col_type
+    return schemas
+
+
+def _staging_fits(existing: dict[str, str], wanted: dict[str, str]) -> bool:
+    """Whether an existing staging table can take rows typed as `wanted`.
+
+    Columns must match in name and order (BULK INSERT maps by position);
+    NVARCHAR columns may be wider than needed.
+    """
+    if list(existing) != list(wanted):
+        return False
+    for col, wanted_type in wanted.items():
+        have = existing[col]
+        if have == wanted_type:
+            continue
+        if not (have.startswith("NVARCHAR(") and wanted_type.startswith("NVARCHAR(")):
+            return False
+        if have == "NVARCHAR(MAX)":
+            continue
+        if wanted_type == "NVARCHAR(MAX)" or int(have[9:-1]) < int(wanted_type[9:-1]):
+            return False
+    return True
+
+
+def _iter_sqlite_statements(lines):
+    """Yield complete SQLite statements from an iterable of lines.
+
+    sqlite3.complete_statement() handles semicolons inside strings,
+    comments and trigger bodies.
+    """
+    statement = ""
+    for line in lines:
+        *pieces, rest = line.split(";")
+        for piece in pieces:
+            statement += piece + ";"
+            if sqlite3.complete_statement(statement):
+                yield statement
+                statement = ""
+        statement += rest
+    if statement.strip():
+        yield statement
+
+
+def _iter_go_batches(lines):
+    """Yield the non-empty batches of a T-SQL script split on GO lines."""
+    batch = []
+    for line in lines:
+        if _GO_RE.match(line):
+            if "".join(batch).strip():
+                yield "".join(batch)
+            batch = []
+        else:
+            batch.append(line)
+    if "".join(batch).strip():
+        yield "".join(batch)
+
+
+def _iter_chunks(rows, size: int):
+    """Yield lists of up to `size` items from an iterable."""
+    rows = iter(rows)
+    while chunk := list(islice(rows, max(1, size))):
+        yield chunk
+
+
+# SQL Server types for object columns, keyed by pandas.api.types.infer_dtype
+_INFERRED_SQL_TYPES = {
+    "boolean": "BIT",
+    "integer": "BIGINT",
+    "floating": "FLOAT",
+    "mixed-integer-float": "FLOAT",
+    "decimal": "FLOAT",
+    "date": "DATE",
+    "datetime": "DATETIME2",
+}
+
+
+# Staging NVARCHAR widths, smallest first; wider text is NVARCHAR(MAX).
+# Fixed steps keep a batch's longest value from changing the staging
+# schema (and forcing a rebuild) on every run.
+_NVARCHAR_WIDTHS = (64, 256, 4000)
+
+
+def _sql_server_type(series: pd.Series) -> str:
+    """Map a DataFrame column to a SQL Server type for staging.
+
+    Fixed-width types keep staging rows in-row (not LOB pages), which
+    is much faster to load and MERGE than NVARCHAR(MAX) everywhere.
+    """
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BIT"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "BIGINT"
+    if pd.api.types.is_float_dtype(dtype):
+        return "FLOAT"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "DATETIME2"
+
+    # Object columns: infer from the values (e.g. enforce_types leaves
+    # "date" columns as object dtype holding date objects)
+    non_null = series.dropna()
+    if non_null.empty:
+        return "NVARCHAR(4000)"
+    kind = pd.api.types.infer_dtype(non_null, skipna=True)
+    if kind in _INFERRED_SQL_TYPES:
+        return _INFERRED_SQL_TYPES[kind]
+    # SQL Server measures NVARCHAR in UTF-16 code units (non-BMP characters
+    # such as emoji take two)
+    max_len = int(non_null.astype(str).str.encode("utf-16-le").str.len().max()) // 2
+    for width in _NVARCHAR_WIDTHS:
+        if max_len <= width:
+            return f"NVARCHAR({width})"
+    return "NVARCHAR(MAX)"
+
+
+def _sqlite_type(dtype) -> str:
+    """Map a pandas dtype to a SQLite column type."""
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
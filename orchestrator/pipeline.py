@@ -1,27 +1,26 @@
 """Main ETL pipeline: extract -> transform -> load for a single QBO client."""
 
-import json
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import chain
 from pathlib import Path
 
-from config.settings import Settings
-from config.tables import ENTITY_TO_SCHEMA_MAP
+import orjson
+
+from config.settings import Settings, default_fiscal_range
+from config.tables import ENTITY_TABLES, ENTITY_TO_SCHEMA_MAP
 from auth.oauth_manager import OAuthManager
 from extract.qbo_client import QBOClient
-from extract.entity_extractor import extract_all_entities
-from extract.report_extractor import extract_all_reports, flatten_report_rows
-from transform.flatteners import (
-    flatten_invoice_lines,
-    flatten_bill_lines,
-    flatten_purchase_lines,
-    flatten_payment_lines,
-    flatten_estimate_lines,
-)
-from transform.schema_mapper import map_to_schema
+from extract.entity_cache import load_entities, save_entities
+from extract.entity_extractor import iter_entities
+from extract.report_extractor import extract_all_reports, flatten_report_rows_df
+from transform.schema_mapper import iter_map_and_flatten
 from transform.data_quality import (
+    apply_types_parallel,
     enforce_types,
+    enforce_types_arrow,
     deduplicate,
-    add_date_key,
+    date_to_key,
     INVOICE_TYPES,
     INVOICE_LINE_TYPES,
     BILL_TYPES,
@@ -31,17 +30,18 @@ from transform.data_quality import (
     CUSTOMER_TYPES,
 )
 from load.sql_loader import SQLLoader
-from load.raw_archiver import archive_raw_json
+from load.raw_archiver import archive_raw_json, ensure_archive_container
 
 logger = logging.getLogger(__name__)
 
 # Tables that produce both a header fact table and a line-item fact table
+# (lines are flattened by iter_map_and_flatten in the same pass as the header)
 LINE_ITEM_TABLES = {
-    "Invoice": (flatten_invoice_lines, "fact_invoice_line", INVOICE_LINE_TYPES, ["invoice_id", "line_id"]),
-    "Bill": (flatten_bill_lines, "fact_bill_line", INVOICE_LINE_TYPES, ["bill_id", "line_id"]),
-    "Purchase": (flatten_purchase_lines, "fact_purchase_line", INVOICE_LINE_TYPES, ["purchase_id", "line_id"]),
-    "Payment": (flatten_payment_lines, "fact_payment_line", None, ["payment_id", "linked_invoice_id"]),
-    "Estimate": (flatten_estimate_lines, "fact_estimate_line", INVOICE_LINE_TYPES, ["estimate_id", "line_id"]),
+    "Invoice": ("fact_invoice_line", INVOICE_LINE_TYPES, ["invoice_id", "line_id"]),
+    "Bill": ("fact_bill_line", INVOICE_LINE_TYPES, ["bill_id", "line_id"]),
+    "Purchase": ("fact_purchase_line", INVOICE_LINE_TYPES, ["purchase_id", "line_id"]),
+    "Payment": ("fact_payment_line", None, ["payment_id", "linked_invoice_id"]),
+    "Estimate": ("fact_estimate_line", INVOICE_LINE_TYPES, ["estimate_id", "line_id"]),
 }
 
 # Type enforcement rules per target table
@@ -78,105 +78,201 @@ DATE_KEY_COLUMNS = {
 }
 
 
-def run_pipeline_for_client(client_config: dict, settings: Settings):
-    """Execute full ETL for a single client."""
+def run_pipeline_for_client(
+    client_config: dict,
+    settings: Settings,
+    report_range: tuple[str, str] = None,
+    from_cache: bool = False,
+):
+    """Execute full ETL for a single client.
+
+    Args:
+        report_range: (start_date, end_date) for report extraction.
+            Defaults to default_fiscal_range().
+        from_cache: Replay entities from the local Parquet cache (if a
+            recent one exists) instead of extracting them from QBO.
+    """
     client_id = client_config["client_id"]
+    start_date, end_date = report_range or default_fiscal_range()
     logger.info(f"=== Starting pipeline for client: {client_id} ===")
 
     # Initialize components
     oauth = OAuthManager(settings, client_id)
     qbo = QBOClient(oauth, settings)
     loader = SQLLoader(settings, client_id)
+    # Raw archives are pure I/O; write them in the background so they
+    # overlap with transform and load instead of blocking them
+    io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="archive")
+    archive_futures = []
+    enforce = enforce_types_arrow if settings.USE_ARROW_DTYPES else enforce_types
 
-    # --- Phase 1: Extract all entity tables ---
-    logger.info("Phase 1: Extracting entity tables...")
-    raw_entities = extract_all_entities(qbo)
-
-    # --- Phase 2: Transform and load each entity ---
-    logger.info("Phase 2: Transform and load entities...")
-    for table_name, raw_records in raw_entities.items():
-        if not raw_records:
-            continue
-
-        # Archive raw JSON
-        archive_raw_json(settings, client_id, table_name, raw_records)
-
-        # Map to star schema (header/dimension table)
-        target_table = ENTITY_TO_SCHEMA_MAP.get(table_name)
-        if not target_table:
-            logger.warning(f"  No schema mapping for {table_name}, skipping")
-            continue
-
-        df = map_to_schema(table_name, raw_records)
-        if df.empty:
-            continue
-
-        # Apply type enforcement
-        type_rules = TYPE_RULES.get(target_table)
-        if type_rules:
-            df = enforce_types(df, type_rules)
-
-        # Deduplicate
-        dedup_keys = DEDUP_KEYS.get(target_table)
-        if dedup_keys:
-            df = deduplicate(df, dedup_keys)
-
-        # Add date keys
-        date_keys = DATE_KEY_COLUMNS.get(target_table, [])
-        for date_col, key_col in date_keys:
-            df = add_date_key(df, date_col, key_col)
-
-        # Load header/dimension table
-        loader.upsert(target_table, df)
-
-        # Flatten and load line items if applicable
-        if table_name in LINE_ITEM_TABLES:
-            flattener, line_table, line_types, line_dedup_keys = LINE_ITEM_TABLES[table_name]
-            df_lines = flattener(raw_records)
-            if not df_lines.empty:
-                if line_types:
-                    df_lines = enforce_types(df_lines, line_types)
-                df_lines = deduplicate(df_lines, line_dedup_keys)
-                loader.upsert(line_table, df_lines)
-
-    # --- Phase 3: Extract and load reports ---
-    logger.info("Phase 3: Extracting reports...")
     try:
-        raw_reports = extract_all_reports(qbo)
-        for report_name, report_data in raw_reports.items():
-            if not report_data:
+        # --- Phases 1+2: Extract entity tables, transform and load each ---
+        # Tables are yielded as soon as they finish extracting, so loading
+        # one table overlaps with the API calls for the rest
+        logger.info("Phase 1+2: Extracting, transforming and loading entities...")
+        cached = load_entities(settings, client_id) if from_cache else {}
+        # Tables missing from the cache (failed or empty saves) are
+        # extracted from QBO as usual
+        to_extract = [table for table in ENTITY_TABLES if table not in cached]
+        if cached:
+            logger.info(f"  Replaying {len(cached)} cached entity table(s)")
+        if from_cache and to_extract:
+            logger.info(f"  Not cached, extracting from QBO: {', '.join(to_extract)}")
+        entities = chain(cached.items(), iter_entities(qbo, to_extract))
+
+        for table_name, raw_records in entities:
+            if not raw_records:
                 continue
-            archive_raw_json(settings, client_id, f"report_{report_name}", report_data)
-            rows = flatten_report_rows(report_data)
-            if rows:
-                import pandas as pd
-                df_report = pd.DataFrame(rows)
-                loader.upsert(f"report_{report_name.lower()}", df_report)
-    except Exception as e:
-        logger.error(f"Report extraction failed: {e}")
+
+            # Archive raw JSON and cache for replay (skip replayed tables)
+            if table_name not in cached:
+                archive_futures.append(io_pool.submit(
+                    archive_raw_json, settings, client_id, table_name, raw_records
+                ))
+                archive_futures.append(io_pool.submit(
+                    save_entities, settings, client_id, table_name, raw_records
+                ))
+
+            # Map to star schema (header/dimension table)
+            target_table = ENTITY_TO_SCHEMA_MAP.get(table_name)
+            if not target_table:
+                logger.warning(f"  No schema mapping for {table_name}, skipping")
+                continue
+
+            # Map header rows and flatten line items in one pass over the
+            # records, so header and lines are typed together (on separate
+            # threads when they are large). Line-item tables are mapped,
+            # typed and loaded FLATTEN_CHUNK_RECORDS records at a time to
+            # bound peak memory; every row has a primary key, so upserting
+            # chunk by chunk gives the same result as one upsert. Very large
+            # chunks are mapped in worker processes when
+            # PARALLEL_MAP_MIN_RECORDS is set.
+            chunks = iter_map_and_flatten(
+                table_name, raw_records, settings.FLATTEN_CHUNK_RECORDS,
+                parallel_min_records=settings.PARALLEL_MAP_MIN_RECORDS,
+            )
+            for df, df_lines in chunks:
+                if df.empty:
+                    continue
+
+                frames = {target_table: df}
+                type_maps = {target_table: TYPE_RULES.get(target_table)}
+                line_spec = LINE_ITEM_TABLES.get(table_name)
+                if line_spec:
+                    line_table, line_types, line_dedup_keys = line_spec
+                    if df_lines is not None and not df_lines.empty:
+                        frames[line_table] = df_lines
+                        type_maps[line_table] = line_types
+
+                # Apply type enforcement
+                frames = apply_types_parallel(frames, type_maps, enforce=enforce)
+                df = frames[target_table]
+
+                # Deduplicate
+                dedup_keys = DEDUP_KEYS.get(target_table)
+                if dedup_keys:
+                    df = deduplicate(df, dedup_keys)
+
+                # Add date keys, all in one assign
+                date_keys = DATE_KEY_COLUMNS.get(target_table)
+                if date_keys:
+                    df = df.assign(**{
+                        key_col: date_to_key(df[date_col]) if date_col in df.columns else None
+                        for date_col, key_col in date_keys
+                    })
+
+                # Load header/dimension table
+                loader.upsert(target_table, df)
+
+                # Load line items if applicable
+                if line_spec and line_table in frames:
+                    df_lines = deduplicate(frames[line_table], line_dedup_keys)
+                    loader.upsert(line_table, df_lines)
+
+        # --- Phase 3: Extract and load reports ---
+        logger.info("Phase 3: Extracting reports...")
+        try:
+            raw_reports = extract_all_reports(qbo, start_date, end_date)
+            for report_name, report_data in raw_reports.items():
+                if not report_data:
+                    continue
+                archive_futures.append(io_pool.submit(
+                    archive_raw_json, settings, client_id,
+                    f"report_{report_name}", report_data,
+                ))
+                df_report = flatten_report_rows_df(report_data)
+                if not df_report.empty:
+                    loader.upsert(f"report_{report_name.lower()}", df_report)
+        except Exception as e:
+            logger.error(f"Report extraction failed: {e}")
+
+        # Surface any archive failures before reporting success
+        for future in archive_futures:
+            future.result()
+    finally:
+        io_pool.shutdown(wait=True)
+        qbo.close()
+        loader.close()
 
     logger.info(f"=== Pipeline complete for client: {client_id} ===")
 
 
-def run_pipeline_all_clients(settings: Settings):
-    """Run pipeline for all registered clients."""
+def run_pipeline_all_clients(
+    settings: Settings,
+    report_range: tuple[str, str] = None,
+    max_workers: int = None,
+    processes: bool = False,
+):
+    """Run pipeline for all registered clients.
+
+    The report date range is resolved once up front so every client is
+    reported over the same window. Clients are independent, so up to
+    MAX_CLIENTS_CONCURRENT run at once, each with its own QBO session and
+    database connection. They run on threads by default, which keeps them
+    in-process with the host's logging handlers (e.g. App Insights in
+    Azure Functions); processes=True runs them in worker processes.
+    """
     clients_file = Path("config/clients.json")
     if not clients_file.exists():
         logger.error(f"Clients file not found: {clients_file}")
         return
 
-    with open(clients_file) as f:
-        clients = json.load(f)
+    clients = orjson.loads(clients_file.read_bytes())
 
-    logger.info(f"Running pipeline for {len(clients)} client(s)")
-    for client in clients:
-        try:
-            run_pipeline_for_client(client, settings)
-        except Exception as e:
-            logger.error(
-                f"Pipeline failed for {client.get('client_id', '?')}: {e}",
-                exc_info=True,
-            )
+    report_range = report_range or default_fiscal_range()
+    max_workers = max_workers or settings.MAX_CLIENTS_CONCURRENT
+    logger.info(
+        f"Running pipeline for {len(clients)} client(s), "
+        f"{max_workers} at a time"
+    )
+
+    if max_workers <= 1 or len(clients) <= 1:
+        for client in clients:
+            try:
+                run_pipeline_for_client(client, settings, report_range)
+            except Exception as e:
+                logger.error(
+                    f"Pipeline failed for {client.get('client_id', '?')}: {e}",
+                    exc_info=True,
+                )
+        return
+
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(run_pipeline_for_client, client, settings, report_range): client
+            for client in clients
+        }
+        for future in as_completed(futures):
+            client = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(
+                    f"Pipeline failed for {client.get('client_id', '?')}: {e}",
+                    exc_info=True,
+                )
 
 
 def main():
@@ -188,6 +284,11 @@ def main():
         "--client-id",
         help="Run for a specific client only (default: all clients)",
     )
+    parser.add_argument(
+        "--max-workers", type=int, default=None,
+        help="Clients to run in parallel worker processes "
+             "(default: MAX_CLIENTS_CONCURRENT)",
+    )
     args = parser.parse_args()
 
     logging.basicConfig(
@@ -195,13 +296,16 @@ def main():
         format="%(asctime)s %(levelname)s %(name)s: %(message)s",
     )
     settings = Settings()
+    ensure_archive_container(settings)
 
     if args.client_id:
         run_pipeline_for_client(
             {"client_id": args.client_id}, settings
         )
     else:
-        run_pipeline_all_clients(settings)
+        run_pipeline_all_clients(
+            settings, max_workers=args.max_workers, processes=True
+        )
 
 
 if __name__ == "__main__":
@@ -9,19 +9,20 @@ Usage:
 import argparse
 import logging
 import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date
 from pathlib import Path
 
-import pandas as pd
-
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config.settings import Settings
 from auth.oauth_manager import OAuthManager
 from extract.qbo_client import QBOClient
+from extract.entity_cache import DEFAULT_CACHE_DIR
 from extract.entity_extractor import extract_all_entities
-from extract.report_extractor import extract_report, flatten_report_rows
+from extract.report_extractor import extract_report, flatten_report_rows_df
 from transform.flatteners import (
     flatten_invoice_lines,
     flatten_bill_lines,
@@ -30,7 +31,7 @@ from transform.flatteners import (
     flatten_estimate_lines,
 )
 from transform.schema_mapper import map_to_schema
-from transform.data_quality import enforce_types, add_date_key
+from transform.data_quality import enforce_types, add_date_key, concat_categoricals
 from config.tables import ENTITY_TO_SCHEMA_MAP, REPORT_ENDPOINTS
 from load.sql_loader import SQLLoader
 from load.raw_archiver import archive_raw_json
@@ -53,7 +54,12 @@ def backfill_reports(
     start_year: int,
     end_year: int,
 ):
-    """Pull reports for each year in the range."""
+    """Pull reports for each year in the range.
+
+    All (year, report) requests are fetched concurrently; archiving and
+    loading stay on this thread. Every year's rows for a report are then
+    loaded in a single upsert.
+    """
     report_names = [
         "ProfitAndLoss",
         "ProfitAndLossCash",
@@ -62,30 +68,47 @@ def backfill_reports(
         "AgedReceivables",
         "AgedPayables",
     ]
-
-    for year in range(start_year, end_year + 1):
-        start_date = f"{year}-01-01"
-        end_date = f"{year}-12-31"
-        logger.info(f"Backfilling reports for {year}...")
-
-        for report_name in report_names:
+    tasks = [
+        (year, report_name)
+        for year in range(start_year, end_year + 1)
+        for report_name in report_names
+    ]
+    frames = defaultdict(dict)
+    logger.info(f"Backfilling {len(tasks)} reports for {start_year}-{end_year}...")
+
+    # Concurrency is capped so the shared QBO rate limiter is not starved
+    with ThreadPoolExecutor(max_workers=settings.QBO_MAX_CONCURRENCY) as pool:
+        futures = {
+            pool.submit(
+                extract_report, qbo, report_name, f"{year}-01-01", f"{year}-12-31"
+            ): (year, report_name)
+            for year, report_name in tasks
+        }
+        for future in as_completed(futures):
+            year, report_name = futures[future]
             try:
-                report_data = extract_report(qbo, report_name, start_date, end_date)
+                report_data = future.result()
                 if report_data:
                     archive_raw_json(
                         settings, client_id,
                         f"backfill_report_{report_name}_{year}",
                         report_data,
                     )
-                    rows = flatten_report_rows(report_data)
-                    if rows:
-                        df = pd.DataFrame(rows)
+                    df = flatten_report_rows_df(report_data)
+                    if not df.empty:
                         df["_year"] = year
-                        loader.upsert(f"report_{report_name.lower()}", df)
-                        logger.info(f"  {report_name} {year}: {len(rows)} rows")
+                        frames[report_name][year] = df
+                        logger.info(f"  {report_name} {year}: {len(df)} rows")
             except Exception as e:
                 logger.error(f"  {report_name} {year} failed: {e}")
 
+    for report_name, by_year in frames.items():
+        try:
+            df = concat_categoricals([by_year[year] for year in sorted(by_year)])
+            loader.upsert(f"report_{report_name.lower()}", df)
+        except Exception as e:
+            logger.error(f"  {report_name} load failed: {e}")
+
 
 def main():
     parser = argparse.ArgumentParser(description="Backfill historical QBO data")
@@ -106,6 +129,10 @@ def main():
         "--reports-only", action="store_true",
         help="Only backfill report endpoints (skip entities)",
     )
+    parser.add_argument(
+        "--from-cache", action="store_true",
+        help="Replay entities from the local Parquet cache instead of the API",
+    )
     args = parser.parse_args()
 
     logging.basicConfig(
@@ -113,6 +140,9 @@ def main():
         format="%(asctime)s %(levelname)s: %(message)s",
     )
     settings = Settings()
+    # Backfills are long and often retried, so cache entities for --from-cache
+    if not settings.ENTITY_CACHE_DIR:
+        settings = settings.model_copy(update={"ENTITY_CACHE_DIR": DEFAULT_CACHE_DIR})
     end_year = args.end_year or date.today().year
 
     logger.info(f"Backfilling client {args.client_id} for {args.start_year}-{end_year}")
@@ -125,7 +155,9 @@ def main():
     # Entity tables contain all historical data (no date filter needed)
     if not args.reports_only:
         logger.info("Running full entity pipeline...")
-        run_pipeline_for_client({"client_id": args.client_id}, settings)
+        run_pipeline_for_client(
+            {"client_id": args.client_id}, settings, from_cache=args.from_cache
+        )
 
     # Reports need to be pulled per year
     if not args.entities_only:
@@ -134,6 +166,8 @@ def main():
             args.start_year, end_year,
         )
 
+    qbo.close()
+    loader.close()
     logger.info("Backfill complete")
 
 
@@ -5,12 +5,14 @@ Usage:
 """
 
 import argparse
-import json
 import logging
 import sqlite3
 import sys
 from pathlib import Path
 
+import orjson
+import pandas as pd
+
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
@@ -24,15 +26,44 @@ CLIENTS_FILE = Path("config/clients.json")
 
 def load_clients() -> list[dict]:
     if CLIENTS_FILE.exists():
-        with open(CLIENTS_FILE) as f:
-            return json.load(f)
+        return orjson.loads(CLIENTS_FILE.read_bytes())
     return []
 
 
 def save_clients(clients: list[dict]):
     CLIENTS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(CLIENTS_FILE, "w") as f:
-        json.dump(clients, f, indent=2)
+    CLIENTS_FILE.write_bytes(orjson.dumps(clients, option=orjson.OPT_INDENT_2))
+
+
+def build_dim_date(start: str = "2020-01-01", end: str = "2030-12-31") -> pd.DataFrame:
+    """Build one dim_date row per calendar day from start through end.
+
+    Fiscal fields assume a January fiscal year start; adjust if needed.
+    week_of_year is Monday-based with days before the first Monday in
+    week 0 (SQLite/C strftime %W).
+    """
+    dates = pd.date_range(start, end, freq="D")
+    quarter = dates.quarter
+    return pd.DataFrame({
+        "date_key": dates.year * 10000 + dates.month * 100 + dates.day,
+        "full_date": dates.strftime("%Y-%m-%d"),
+        "day_of_week": (dates.dayofweek + 1) % 7,  # Sunday = 0
+        "day_name": dates.day_name(),
+        "day_of_month": dates.day,
+        "day_of_year": dates.dayofyear,
+        "week_of_year": (dates.dayofyear + 6 - dates.dayofweek) // 7,
+        "month_num": dates.month,
+        "month_name": dates.month_name(),
+        "month_short": dates.month_name().str[:3],
+        "quarter_num": quarter,
+        "quarter_name": "Q" + quarter.astype(str),
+        "year_num": dates.year,
+        "fiscal_month": dates.month,
+        "fiscal_quarter": quarter,
+        "fiscal_year": dates.year,
+        "is_weekend": (dates.dayofweek >= 5).astype(int),
+        "is_holiday": 0,
+    })
 
 
 def init_database(settings: Settings):
@@ -45,10 +76,10 @@ def init_database(settings: Settings):
         logger.info("Creating schema tables...")
         loader.execute_sql_file(str(schema_file))
 
-    date_file = scripts_dir / "populate_dim_date.sql"
-    if date_file.exists():
-        logger.info("Populating dim_date...")
-        loader.execute_sql_file(str(date_file))
+    logger.info("Populating dim_date...")
+    loader.replace_table("dim_date", build_dim_date())
+
+    loader.close()
 
     logger.info("Database initialized")
 
@@ -1,42 +1,211 @@
 """Data quality checks and type enforcement for QBO data."""
 
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
+from pandas.api.types import union_categoricals
 
 logger = logging.getLogger(__name__)
 
+# type_map dtype -> conversion group used by enforce_types
+_TYPE_GROUPS = {"Float64": "float", "float64": "float", "float": "float"}
+
+# Conversion group -> pyarrow-backed dtype used by enforce_types_arrow
+_ARROW_TYPES = {
+    "float": "double[pyarrow]",
+    "int": "int64[pyarrow]",
+    "bool": "bool[pyarrow]",
+    "date": "date32[pyarrow]",
+    "datetime": "timestamp[us][pyarrow]",
+}
+
+# apply_types_parallel only uses threads above this many rows in total
+_PARALLEL_MIN_ROWS = 10_000
+
+# Conversion group -> dtype name enforce_types produces, where it is fixed
+_GROUP_DTYPES = {"float": "Float64", "int": "Int64", "bool": "bool"}
+
+# Groups enforce_types parses itself rather than passing to astype
+_PARSED_GROUPS = frozenset({"bool", "date", "datetime"})
+
+# astype targets whose unparseable values are coerced to NA
+_NUMERIC_DTYPES = frozenset({"Float64", "Int64"})
+
+# Values enforce_types treats as True for "bool" columns (1/1.0 match True)
+_TRUE_VALUES = (True, "true", "True")
+
+# Untyped string columns are stored as categories when they have at least
+# this many rows and at most this ratio of distinct values to rows
+_CATEGORY_MIN_ROWS = 1000
+_CATEGORY_MAX_RATIO = 0.1
+
 
 def enforce_types(df: pd.DataFrame, type_map: dict[str, str]) -> pd.DataFrame:
     """Cast DataFrame columns to specified types.
 
+    Float, int, category and other astype targets are cast together with a
+    single astype call; only columns holding values astype can't parse are
+    coerced (unparseable values become NA). Bool columns are mapped in one
+    frame-level isin, and date/datetime columns are parsed with
+    to_datetime. Columns that already have the target dtype are skipped.
+    Untyped string columns with few distinct values in large frames are
+    also converted to categoricals (see _auto_categorize).
+
     Args:
         df: Input DataFrame.
         type_map: Dict of {column_name: pandas_dtype}. Columns not in df are skipped.
 
     Example:
-        enforce_types(df, {"amount": "float64", "is_active": "bool"})
+        enforce_types(df, {"amount": "Float64", "is_active": "bool"})
     """
+    casts = {}
+    parsed = defaultdict(list)
     for col, dtype in type_map.items():
         if col not in df.columns:
             continue
+        group = _TYPE_GROUPS.get(dtype, dtype)
+        if _has_type(df[col].dtype, group):
+            continue
+        if group in _PARSED_GROUPS:
+            parsed[group].append(col)
+        else:
+            casts[col] = _GROUP_DTYPES.get(group, group)
+
+    if casts:
+        _cast_columns(df, casts)
+    for group, cols in parsed.items():
         try:
-            if dtype == "bool":
-                df[col] = df[col].map(
-                    {True: True, False: False, "true": True, "false": False, "True": True, "False": False}
-                ).fillna(False)
-            elif dtype in ("float64", "float"):
-                df[col] = pd.to_numeric(df[col], errors="coerce")
-            elif dtype == "int":
-                df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
-            elif dtype == "date":
-                df[col] = pd.to_datetime(df[col], errors="coerce").dt.date
-            elif dtype == "datetime":
-                df[col] = pd.to_datetime(df[col], errors="coerce")
+            if group == "bool":
+                # Anything not recognizably true (incl. missing) is False
+                df[cols] = df[cols].isin(_TRUE_VALUES)
+            elif group == "date":
+                df[cols] = pd.DataFrame({
+                    col: pd.to_datetime(df[col], errors="coerce").dt.date for col in cols
+                })
             else:
-                df[col] = df[col].astype(dtype, errors="ignore")
+                df[cols] = pd.DataFrame({
+                    col: pd.to_datetime(df[col], errors="coerce") for col in cols
+                })
         except Exception as e:
-            logger.warning(f"Could not cast {col} to {dtype}: {e}")
+            logger.warning("Could not cast %s to %s: %s", cols, group, e)
+    return _auto_categorize(df, skip=type_map)
+
+
+def _cast_columns(df: pd.DataFrame, casts: dict[str, str]):
+    """Cast columns in place with one astype, coercing only columns that fail."""
+    cols = list(casts)
+    try:
+        df[cols] = df[cols].astype(casts)
+        return
+    except (TypeError, ValueError):
+        pass
+    for col, dtype in casts.items():
+        try:
+            try:
+                df[col] = df[col].astype(dtype)
+            except (TypeError, ValueError):
+                if dtype not in _NUMERIC_DTYPES:
+                    raise
+                df[col] = pd.to_numeric(df[col], errors="coerce").astype(dtype)
+        except Exception as e:
+            logger.warning("Could not cast %s to %s: %s", col, dtype, e)
+
+
+def _has_type(dtype, group: str) -> bool:
+    """Whether a column's dtype already matches an enforce_types group."""
+    if group == "datetime":
+        return pd.api.types.is_datetime64_any_dtype(dtype)
+    if group == "category":
+        return isinstance(dtype, pd.CategoricalDtype)
+    if group == "date":
+        return False  # date objects live in object columns; always convert
+    return str(dtype) == _GROUP_DTYPES.get(group, group)
+
+
+def enforce_types_arrow(df: pd.DataFrame, type_map: dict[str, str]) -> pd.DataFrame:
+    """Cast DataFrame columns to specified types, backed by pyarrow.
+
+    Every column is converted with convert_dtypes(dtype_backend="pyarrow"),
+    then typed columns are cast with Arrow's compute kernels. Columns that
+    already have the target type are left alone; columns holding values
+    Arrow can't parse go through enforce_types' coercion instead (bad
+    values become null). Requires pyarrow.
+    """
+    df = df.convert_dtypes(dtype_backend="pyarrow")
+    for col, dtype in type_map.items():
+        if col not in df.columns:
+            continue
+        group = _TYPE_GROUPS.get(dtype, dtype)
+        arrow_type = _ARROW_TYPES.get(group)
+        if arrow_type is None or df[col].dtype == arrow_type:
+            continue
+        try:
+            if group == "bool":
+                df[col] = df[col].isin(_TRUE_VALUES).astype(arrow_type)
+            else:
+                df[col] = df[col].astype(arrow_type)
+        except Exception:
+            coerced = enforce_types(df[[col]].astype(object), {col: dtype})
+            df[col] = coerced[col].astype(arrow_type)
+    return df
+
+
+def apply_types_parallel(
+    dfs: dict[str, pd.DataFrame],
+    type_maps: dict[str, dict],
+    parallel: bool = None,
+    enforce=enforce_types,
+) -> dict[str, pd.DataFrame]:
+    """Run enforce_types (or `enforce`) over several independent frames.
+
+    pandas' numeric and datetime casts release the GIL in their C loops,
+    so frames are cast on separate threads. By default threads are only
+    used when the frames hold more than _PARALLEL_MIN_ROWS rows in total.
+    Frames without a type map are returned unchanged.
+    """
+    jobs = {name: df for name, df in dfs.items() if type_maps.get(name)}
+    if parallel is None:
+        parallel = sum(len(df) for df in jobs.values()) > _PARALLEL_MIN_ROWS
+
+    if not parallel or len(jobs) < 2:
+        return {
+            name: enforce(df, type_maps[name]) if name in jobs else df
+            for name, df in dfs.items()
+        }
+
+    with ThreadPoolExecutor(max_workers=min(8, len(jobs))) as pool:
+        futures = {
+            name: pool.submit(enforce, df, type_maps[name])
+            for name, df in jobs.items()
+        }
+    return {
+        name: futures[name].result() if name in futures else df
+        for name, df in dfs.items()
+    }
+
+
+def _auto_categorize(df: pd.DataFrame, skip=()) -> pd.DataFrame:
+    """Store repetitive string columns as categoricals.
+
+    Only columns of plain strings are considered (object columns holding
+    dates etc. keep their values), and columns in `skip` are left as typed.
+    """
+    if len(df) < _CATEGORY_MIN_ROWS:
+        return df
+    max_unique = len(df) * _CATEGORY_MAX_RATIO
+    for col in df.columns:
+        series = df[col]
+        if col in skip or not (
+            series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+        ):
+            continue
+        if (
+            series.nunique() <= max_unique
+            and pd.api.types.infer_dtype(series, skipna=True) == "string"
+        ):
+            df[col] = series.astype("category")
     return df
 
 
@@ -44,12 +213,61 @@ def deduplicate(df: pd.DataFrame, key_columns: list[str]) -> pd.DataFrame:
     """Remove duplicate rows based on key columns, keeping the last occurrence."""
     if not key_columns or df.empty:
         return df
-    before = len(df)
-    df = df.drop_duplicates(subset=key_columns, keep="last")
-    after = len(df)
-    if before != after:
-        logger.info(f"Removed {before - after} duplicate rows (keys: {key_columns})")
-    return df
+    dupes = df.duplicated(subset=key_columns, keep="last")
+    removed = int(dupes.sum())
+    if not removed:
+        return df
+    logger.info("Removed %d duplicate rows (keys: %s)", removed, key_columns)
+    return df.loc[~dupes]
+
+
+def concat_categoricals(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate frames row-wise (new index), keeping categorical columns.
+
+    pd.concat falls back to object dtype for a categorical column unless
+    every frame has identical categories. Columns that are categorical in
+    every frame are combined with union_categoricals instead (see
+    _union_categorical); all other columns, and categoricals that can't be
+    unioned, are concatenated as usual.
+    """
+    if not frames:
+        return pd.DataFrame()
+    columns = list(dict.fromkeys(col for f in frames for col in f.columns))
+    unioned = {}
+    for col in frames[0].columns:
+        if all(
+            col in f.columns and isinstance(f[col].dtype, pd.CategoricalDtype)
+            for f in frames
+        ):
+            combined = _union_categorical([f[col] for f in frames])
+            if combined is not None:
+                unioned[col] = combined
+    out = pd.concat([f.drop(columns=list(unioned)) for f in frames], ignore_index=True)
+    for col, combined in unioned.items():
+        out[col] = combined
+    return out[columns]
+
+
+def _union_categorical(parts: list[pd.Series]):
+    """union_categoricals over parts whose categories may differ in dtype.
+
+    A part with no categories (e.g. an all-null column) takes the others'
+    category dtype. Returns None if the categories still can't be unioned
+    (e.g. strings in one frame, numbers in another).
+    """
+    dtypes = {p.cat.categories.dtype for p in parts if len(p.cat.categories)}
+    if len(dtypes) > 1:
+        return None
+    if dtypes:
+        empty = pd.Index([], dtype=dtypes.pop())
+        parts = [
+            p if len(p.cat.categories) else p.cat.set_categories(empty)
+            for p in parts
+        ]
+    try:
+        return union_categoricals(parts)
+    except TypeError:
+        return None
 
 
 def add_date_key(df: pd.DataFrame, date_col: str, key_col: str) -> pd.DataFrame:
@@ -57,53 +275,70 @@ def add_date_key(df: pd.DataFrame, date_col: str, key_col: str) -> pd.DataFrame:
     if date_col not in df.columns:
         df[key_col] = None
         return df
-    dates = pd.to_datetime(df[date_col], errors="coerce")
-    df[key_col] = dates.dt.strftime("%Y%m%d").astype("Int64")
+    df[key_col] = date_to_key(df[date_col])
     return df
 
 
+def date_to_key(dates: pd.Series) -> pd.Series:
+    """Convert a date column to nullable integer date keys (YYYYMMDD)."""
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce")
+    key = dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day
+    return key.mask(dates.isna()).astype("Int64")
+
+
 # Standard type maps for each table
 INVOICE_TYPES = {
-    "total_amount": "float64",
-    "balance": "float64",
-    "total_tax": "float64",
+    "total_amount": "Float64",
+    "balance": "Float64",
+    "total_tax": "Float64",
     "txn_date": "date",
     "due_date": "date",
+    "email_status": "category",
+    "print_status": "category",
 }
 
 INVOICE_LINE_TYPES = {
-    "amount": "float64",
-    "quantity": "float64",
-    "unit_price": "float64",
+    "amount": "Float64",
+    "quantity": "Float64",
+    "unit_price": "Float64",
+    "detail_type": "category",
+    "linked_txn_type": "category",
+    "billable_status": "category",
 }
 
 BILL_TYPES = {
-    "total_amount": "float64",
-    "balance": "float64",
+    "total_amount": "Float64",
+    "balance": "Float64",
     "txn_date": "date",
     "due_date": "date",
 }
 
 PAYMENT_TYPES = {
-    "total_amount": "float64",
-    "unapplied_amount": "float64",
+    "total_amount": "Float64",
+    "unapplied_amount": "Float64",
     "txn_date": "date",
 }
 
 PURCHASE_TYPES = {
-    "total_amount": "float64",
+    "total_amount": "Float64",
     "is_credit": "bool",
     "txn_date": "date",
+    "payment_type": "category",
+    "vendor_type": "category",
 }
 
 ACCOUNT_TYPES = {
-    "current_balance": "float64",
+    "classification": "category",
+    "account_type": "category",
+    "account_sub_type": "category",
+    "current_balance": "Float64",
     "is_sub_account": "bool",
     "is_active": "bool",
 }
 
 CUSTOMER_TYPES = {
-    "balance": "float64",
+    "balance": "Float64",
     "is_job": "bool",
     "is_active": "bool",
 }
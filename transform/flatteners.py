@@ -3,44 +3,132 @@
 Each QBO transaction type (Invoice, Bill, Purchase, etc.) contains a `Line`
 array with nested detail objects. These flatteners produce one row per line
 item, suitable for loading into star-schema fact tables.
+
+Output is built column-wise: one list per output column, appended to as
+lines are walked, then handed to pandas as a dict of lists. This avoids a
+per-row dict and pandas' list-of-dicts key matching. The per-record
+append_*_lines functions are exposed so schema_mapper.map_and_flatten can
+emit header and line rows in the same pass over the records.
 """
 
+from types import MappingProxyType
+
 import pandas as pd
 
+# Shared read-only default for missing or null nested objects, so a miss
+# doesn't allocate a new {} on every lookup
+_EMPTY = MappingProxyType({})
+
+# Summary lines on Invoices and Estimates that carry no item detail
+_SKIP_SALES_DETAIL_TYPES = frozenset(("SubTotalLineDetail", "DiscountLineDetail"))
+
+
+def frame_from_columns(columns: dict[str, list]) -> pd.DataFrame:
+    """Build a DataFrame from column lists (empty frame if there are no rows)."""
+    if not next(iter(columns.values())):
+        return pd.DataFrame()
+    return pd.DataFrame(columns)
+
+
+def new_columns(names: tuple) -> dict[str, list]:
+    """Return an empty column list for each output column name."""
+    return {name: [] for name in names}
+
+
+def _flatten(names: tuple, append_lines, records: list[dict]) -> pd.DataFrame:
+    """Run a per-record line appender over all records and build the frame."""
+    columns = new_columns(names)
+    for record in records:
+        append_lines(columns, record)
+    return frame_from_columns(columns)
+
+
+INVOICE_LINE_COLUMNS = (
+    "invoice_id", "line_id", "line_num", "description", "amount",
+    "quantity", "unit_price", "item_id", "item_name", "account_id",
+    "account_name", "tax_code_ref", "service_date", "detail_type",
+    "linked_txn_id", "linked_txn_type",
+)
+
+
+def append_invoice_lines(columns: dict[str, list], inv: dict):
+    """Append one Invoice's SalesItemLineDetail lines to `columns`."""
+    inv_id = inv.get("Id")
+    for line in inv.get("Line", ()):
+        detail_type = line.get("DetailType", "")
+        if detail_type in _SKIP_SALES_DETAIL_TYPES:
+            continue
+        detail = line.get("SalesItemLineDetail") or _EMPTY
+        item_ref = detail.get("ItemRef") or _EMPTY
+        account_ref = detail.get("ItemAccountRef") or _EMPTY
+        linked = line.get("LinkedTxn", ())
+
+        columns["invoice_id"].append(inv_id)
+        columns["line_id"].append(line.get("Id"))
+        columns["line_num"].append(line.get("LineNum"))
+        columns["description"].append(line.get("Description"))
+        columns["amount"].append(line.get("Amount"))
+        columns["quantity"].append(detail.get("Qty"))
+        columns["unit_price"].append(detail.get("UnitPrice"))
+        columns["item_id"].append(item_ref.get("value"))
+        columns["item_name"].append(item_ref.get("name"))
+        columns["account_id"].append(account_ref.get("value"))
+        columns["account_name"].append(account_ref.get("name"))
+        columns["tax_code_ref"].append((detail.get("TaxCodeRef") or _EMPTY).get("value"))
+        columns["service_date"].append(detail.get("ServiceDate"))
+        columns["detail_type"].append(detail_type)
+        columns["linked_txn_id"].append(linked[0]["TxnId"] if linked else None)
+        columns["linked_txn_type"].append(linked[0]["TxnType"] if linked else None)
+
 
 def flatten_invoice_lines(invoices: list[dict]) -> pd.DataFrame:
     """Flatten Invoice -> Line -> SalesItemLineDetail into one row per line item."""
-    rows = []
-    for inv in invoices:
-        invoice_id = inv.get("Id")
-        for line in inv.get("Line", []):
-            detail_type = line.get("DetailType", "")
-            if detail_type in ("SubTotalLineDetail", "DiscountLineDetail"):
-                continue
-            detail = line.get("SalesItemLineDetail", {})
-            item_ref = detail.get("ItemRef", {})
-            account_ref = detail.get("ItemAccountRef", {})
-            linked = line.get("LinkedTxn", [])
-
-            rows.append({
-                "invoice_id": invoice_id,
-                "line_id": line.get("Id"),
-                "line_num": line.get("LineNum"),
-                "description": line.get("Description"),
-                "amount": line.get("Amount"),
-                "quantity": detail.get("Qty"),
-                "unit_price": detail.get("UnitPrice"),
-                "item_id": item_ref.get("value"),
-                "item_name": item_ref.get("name"),
-                "account_id": account_ref.get("value"),
-                "account_name": account_ref.get("name"),
-                "tax_code_ref": detail.get("TaxCodeRef", {}).get("value"),
-                "service_date": detail.get("ServiceDate"),
-                "detail_type": detail_type,
-                "linked_txn_id": linked[0]["TxnId"] if linked else None,
-                "linked_txn_type": linked[0]["TxnType"] if linked else None,
-            })
-    return pd.DataFrame(rows)
+    return _flatten(INVOICE_LINE_COLUMNS, append_invoice_lines, invoices)
+
+
+BILL_LINE_COLUMNS = (
+    "bill_id", "line_id", "line_num", "description", "amount", "detail_type",
+    "quantity", "unit_price", "item_id", "item_name", "account_id",
+    "account_name", "billable_status", "customer_id", "customer_name",
+    "tax_code_ref",
+)
+
+
+def append_bill_lines(columns: dict[str, list], bill: dict):
+    """Append one Bill's expense lines to `columns`."""
+    b_id = bill.get("Id")
+    for line in bill.get("Line", ()):
+        detail_type = line.get("DetailType", "")
+        if detail_type == "ItemBasedExpenseLineDetail":
+            detail = line.get("ItemBasedExpenseLineDetail") or _EMPTY
+            item_ref = detail.get("ItemRef") or _EMPTY
+            acct_ref = _EMPTY
+            qty, price = detail.get("Qty"), detail.get("UnitPrice")
+        elif detail_type == "AccountBasedExpenseLineDetail":
+            detail = line.get("AccountBasedExpenseLineDetail") or _EMPTY
+            item_ref = _EMPTY
+            acct_ref = detail.get("AccountRef") or _EMPTY
+            qty = price = None
+        else:
+            continue  # Skip subtotals and other non-data lines
+        cust = detail.get("CustomerRef") or _EMPTY
+
+        columns["bill_id"].append(b_id)
+        columns["line_id"].append(line.get("Id"))
+        columns["line_num"].append(line.get("LineNum"))
+        columns["description"].append(line.get("Description"))
+        columns["amount"].append(line.get("Amount"))
+        columns["detail_type"].append(detail_type)
+        columns["quantity"].append(qty)
+        columns["unit_price"].append(price)
+        columns["item_id"].append(item_ref.get("value"))
+        columns["item_name"].append(item_ref.get("name"))
+        columns["account_id"].append(acct_ref.get("value"))
+        columns["account_name"].append(acct_ref.get("name"))
+        columns["billable_status"].append(detail.get("BillableStatus"))
+        columns["customer_id"].append(cust.get("value"))
+        columns["customer_name"].append(cust.get("name"))
+        columns["tax_code_ref"].append((detail.get("TaxCodeRef") or _EMPTY).get("value"))
 
 
 def flatten_bill_lines(bills: list[dict]) -> pd.DataFrame:
@@ -48,58 +136,44 @@ def flatten_bill_lines(bills: list[dict]) -> pd.DataFrame:
 
     Bills can have either AccountBasedExpenseLineDetail or ItemBasedExpenseLineDetail.
     """
-    rows = []
-    for bill in bills:
-        bill_id = bill.get("Id")
-        for line in bill.get("Line", []):
-            detail_type = line.get("DetailType", "")
-            row = {
-                "bill_id": bill_id,
-                "line_id": line.get("Id"),
-                "line_num": line.get("LineNum"),
-                "description": line.get("Description"),
-                "amount": line.get("Amount"),
-                "detail_type": detail_type,
-                "quantity": None,
-                "unit_price": None,
-                "item_id": None,
-                "item_name": None,
-                "account_id": None,
-                "account_name": None,
-                "billable_status": None,
-                "customer_id": None,
-                "customer_name": None,
-                "tax_code_ref": None,
-            }
-
-            if detail_type == "ItemBasedExpenseLineDetail":
-                detail = line.get("ItemBasedExpenseLineDetail", {})
-                item_ref = detail.get("ItemRef", {})
-                row["quantity"] = detail.get("Qty")
-                row["unit_price"] = detail.get("UnitPrice")
-                row["item_id"] = item_ref.get("value")
-                row["item_name"] = item_ref.get("name")
-                row["billable_status"] = detail.get("BillableStatus")
-                row["tax_code_ref"] = detail.get("TaxCodeRef", {}).get("value")
-                cust = detail.get("CustomerRef", {})
-                row["customer_id"] = cust.get("value")
-                row["customer_name"] = cust.get("name")
-
-            elif detail_type == "AccountBasedExpenseLineDetail":
-                detail = line.get("AccountBasedExpenseLineDetail", {})
-                acct_ref = detail.get("AccountRef", {})
-                row["account_id"] = acct_ref.get("value")
-                row["account_name"] = acct_ref.get("name")
-                row["billable_status"] = detail.get("BillableStatus")
-                row["tax_code_ref"] = detail.get("TaxCodeRef", {}).get("value")
-                cust = detail.get("CustomerRef", {})
-                row["customer_id"] = cust.get("value")
-                row["customer_name"] = cust.get("name")
-            else:
-                continue  # Skip subtotals and other non-data lines
-
-            rows.append(row)
-    return pd.DataFrame(rows)
+    return _flatten(BILL_LINE_COLUMNS, append_bill_lines, bills)
+
+
+PURCHASE_LINE_COLUMNS = (
+    "purchase_id", "line_id", "description", "amount", "detail_type",
+    "item_id", "item_name", "account_id", "account_name",
+    "billable_status", "customer_id", "tax_code_ref",
+)
+
+
+def append_purchase_lines(columns: dict[str, list], purchase: dict):
+    """Append one Purchase's expense lines to `columns`."""
+    p_id = purchase.get("Id")
+    for line in purchase.get("Line", ()):
+        detail_type = line.get("DetailType", "")
+        if detail_type == "ItemBasedExpenseLineDetail":
+            detail = line.get("ItemBasedExpenseLineDetail") or _EMPTY
+            item_ref = detail.get("ItemRef") or _EMPTY
+            acct_ref = _EMPTY
+        elif detail_type == "AccountBasedExpenseLineDetail":
+            detail = line.get("AccountBasedExpenseLineDetail") or _EMPTY
+            item_ref = _EMPTY
+            acct_ref = detail.get("AccountRef") or _EMPTY
+        else:
+            continue
+
+        columns["purchase_id"].append(p_id)
+        columns["line_id"].append(line.get("Id"))
+        columns["description"].append(line.get("Description"))
+        columns["amount"].append(line.get("Amount"))
+        columns["detail_type"].append(detail_type)
+        columns["item_id"].append(item_ref.get("value"))
+        columns["item_name"].append(item_ref.get("name"))
+        columns["account_id"].append(acct_ref.get("value"))
+        columns["account_name"].append(acct_ref.get("name"))
+        columns["billable_status"].append(detail.get("BillableStatus"))
+        columns["customer_id"].append((detail.get("CustomerRef") or _EMPTY).get("value"))
+        columns["tax_code_ref"].append((detail.get("TaxCodeRef") or _EMPTY).get("value"))
 
 
 def flatten_purchase_lines(purchases: list[dict]) -> pd.DataFrame:
@@ -108,103 +182,74 @@ def flatten_purchase_lines(purchases: list[dict]) -> pd.DataFrame:
     Purchases (checks, credit card charges, cash) have the same line
     detail types as Bills.
     """
-    rows = []
-    for purchase in purchases:
-        purchase_id = purchase.get("Id")
-        for line in purchase.get("Line", []):
-            detail_type = line.get("DetailType", "")
-            row = {
-                "purchase_id": purchase_id,
-                "line_id": line.get("Id"),
-                "description": line.get("Description"),
-                "amount": line.get("Amount"),
-                "detail_type": detail_type,
-                "item_id": None,
-                "item_name": None,
-                "account_id": None,
-                "account_name": None,
-                "billable_status": None,
-                "customer_id": None,
-                "tax_code_ref": None,
-            }
-
-            if detail_type == "ItemBasedExpenseLineDetail":
-                detail = line.get("ItemBasedExpenseLineDetail", {})
-                item_ref = detail.get("ItemRef", {})
-                row["item_id"] = item_ref.get("value")
-                row["item_name"] = item_ref.get("name")
-                row["billable_status"] = detail.get("BillableStatus")
-                row["tax_code_ref"] = detail.get("TaxCodeRef", {}).get("value")
-                cust = detail.get("CustomerRef", {})
-                row["customer_id"] = cust.get("value")
-
-            elif detail_type == "AccountBasedExpenseLineDetail":
-                detail = line.get("AccountBasedExpenseLineDetail", {})
-                acct_ref = detail.get("AccountRef", {})
-                row["account_id"] = acct_ref.get("value")
-                row["account_name"] = acct_ref.get("name")
-                row["billable_status"] = detail.get("BillableStatus")
-                row["tax_code_ref"] = detail.get("TaxCodeRef", {}).get("value")
-                cust = detail.get("CustomerRef", {})
-                row["customer_id"] = cust.get("value")
-            else:
-                continue
-
-            rows.append(row)
-    return pd.DataFrame(rows)
+    return _flatten(PURCHASE_LINE_COLUMNS, append_purchase_lines, purchases)
+
+
+PAYMENT_LINE_COLUMNS = (
+    "payment_id", "amount", "linked_invoice_id", "linked_txn_type",
+    "original_open_balance", "invoice_doc_number",
+)
+
+
+def append_payment_lines(columns: dict[str, list], pmt: dict):
+    """Append one Payment's linked-transaction lines to `columns`."""
+    p_id = pmt.get("Id")
+    for line in pmt.get("Line", ()):
+        linked = line.get("LinkedTxn", ())
+        # Extract metadata from LineEx NameValue pairs
+        line_ex = (line.get("LineEx") or _EMPTY).get("any", ())
+        ex_values = {
+            (val := item.get("value") or _EMPTY).get("Name", ""): val.get("Value", "")
+            for item in line_ex
+        } if line_ex else _EMPTY
+
+        columns["payment_id"].append(p_id)
+        columns["amount"].append(line.get("Amount"))
+        columns["linked_invoice_id"].append(linked[0]["TxnId"] if linked else None)
+        columns["linked_txn_type"].append(linked[0]["TxnType"] if linked else None)
+        columns["original_open_balance"].append(ex_values.get("txnOpenBalance"))
+        columns["invoice_doc_number"].append(ex_values.get("txnReferenceNumber"))
 
 
 def flatten_payment_lines(payments: list[dict]) -> pd.DataFrame:
     """Flatten Payment -> Line into one row per linked invoice payment."""
-    rows = []
-    for pmt in payments:
-        payment_id = pmt.get("Id")
-        for line in pmt.get("Line", []):
-            linked = line.get("LinkedTxn", [])
-            # Extract metadata from LineEx NameValue pairs
-            line_ex = line.get("LineEx", {}).get("any", [])
-            ex_values = {}
-            for item in line_ex:
-                val = item.get("value", {})
-                ex_values[val.get("Name", "")] = val.get("Value", "")
-
-            rows.append({
-                "payment_id": payment_id,
-                "amount": line.get("Amount"),
-                "linked_invoice_id": linked[0]["TxnId"] if linked else None,
-                "linked_txn_type": linked[0]["TxnType"] if linked else None,
-                "original_open_balance": ex_values.get("txnOpenBalance"),
-                "invoice_doc_number": ex_values.get("txnReferenceNumber"),
-            })
-    return pd.DataFrame(rows)
+    return _flatten(PAYMENT_LINE_COLUMNS, append_payment_lines, payments)
+
+
+ESTIMATE_LINE_COLUMNS = (
+    "estimate_id", "line_id", "line_num", "description", "amount",
+    "quantity", "unit_price", "item_id", "item_name", "account_id",
+    "account_name", "tax_code_ref", "detail_type",
+)
+
+
+def append_estimate_lines(columns: dict[str, list], est: dict):
+    """Append one Estimate's SalesItemLineDetail lines to `columns`."""
+    est_id = est.get("Id")
+    for line in est.get("Line", ()):
+        detail_type = line.get("DetailType", "")
+        if detail_type in _SKIP_SALES_DETAIL_TYPES:
+            continue
+        detail = line.get("SalesItemLineDetail") or _EMPTY
+        item_ref = detail.get("ItemRef") or _EMPTY
+        account_ref = detail.get("ItemAccountRef") or _EMPTY
+
+        columns["estimate_id"].append(est_id)
+        columns["line_id"].append(line.get("Id"))
+        columns["line_num"].append(line.get("LineNum"))
+        columns["description"].append(line.get("Description"))
+        columns["amount"].append(line.get("Amount"))
+        columns["quantity"].append(detail.get("Qty"))
+        columns["unit_price"].append(detail.get("UnitPrice"))
+        columns["item_id"].append(item_ref.get("value"))
+        columns["item_name"].append(item_ref.get("name"))
+        columns["account_id"].append(account_ref.get("value"))
+        columns["account_name"].append(account_ref.get("name"))
+        columns["tax_code_ref"].append((detail.get("TaxCodeRef") or _EMPTY).get("value"))
+        columns["detail_type"].append(detail_type)
 
 
 def flatten_estimate_lines(estimates: list[dict]) -> pd.DataFrame:
     """Flatten Estimate -> Line -> SalesItemLineDetail."""
-    rows = []
-    for est in estimates:
-        estimate_id = est.get("Id")
-        for line in est.get("Line", []):
-            detail_type = line.get("DetailType", "")
-            if detail_type in ("SubTotalLineDetail", "DiscountLineDetail"):
-                continue
-            detail = line.get("SalesItemLineDetail", {})
-            item_ref = detail.get("ItemRef", {})
-            account_ref = detail.get("ItemAccountRef", {})
-
-            rows.append({
-                "estimate_id": estimate_id,
-                "line_id": line.get("Id"),
-                "line_num": line.get("LineNum"),
-                "description": line.get("Description"),
-                "amount": line.get("Amount"),
-                "quantity": detail.get("Qty"),
-                "unit_price": detail.get("UnitPrice"),
-                "item_id": item_ref.get("value"),
-                "item_name": item_ref.get("name"),
-                "account_id": account_ref.get("value"),
-                "account_name": account_ref.get("name"),
-                "tax_code_ref": detail.get("TaxCodeRef", {}).get("value"),
-                "detail_type": detail_type,
-            })
-    return pd.DataFrame(rows)
+    return _flatten(ESTIMATE_LINE_COLUMNS, append_estimate_lines, estimates)
+
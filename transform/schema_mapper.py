@@ -1,231 +1,274 @@
-"""Map raw QBO API records to star-schema dimension and fact table columns."""
+"""Map raw QBO API records to star-schema dimension and fact table columns.
+
+Each mapper is declared as a schema of (column, key path, default) entries.
+_compile_mapper turns a schema into a generated function with the key paths
+inlined, which builds the frame column-wise (one list per output column)
+rather than from a list of per-record dicts.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from types import MappingProxyType
 
 import pandas as pd
 
+from transform.flatteners import (
+    BILL_LINE_COLUMNS,
+    ESTIMATE_LINE_COLUMNS,
+    INVOICE_LINE_COLUMNS,
+    PAYMENT_LINE_COLUMNS,
+    PURCHASE_LINE_COLUMNS,
+    append_bill_lines,
+    append_estimate_lines,
+    append_invoice_lines,
+    append_payment_lines,
+    append_purchase_lines,
+    frame_from_columns,
+    new_columns,
+)
 
-def map_account(records: list[dict]) -> pd.DataFrame:
-    """Map Account records to dim_account schema."""
+
+# Mapper schemas: (output column, key path into the record, value when the
+# path is missing). A callable in place of the path computes the value from
+# the whole record.
+ACCOUNT_SCHEMA = (
+    ("account_id", ("Id",), None),
+    ("account_name", ("Name",), None),
+    ("fully_qualified_name", ("FullyQualifiedName",), None),
+    ("classification", ("Classification",), None),
+    ("account_type", ("AccountType",), None),
+    ("account_sub_type", ("AccountSubType",), None),
+    ("is_sub_account", ("SubAccount",), False),
+    ("parent_account_id", ("ParentRef", "value"), None),
+    ("is_active", ("Active",), True),
+    ("current_balance", ("CurrentBalance",), 0),
+    ("currency_code", ("CurrencyRef", "value"), "USD"),
+)
+
+CUSTOMER_SCHEMA = (
+    ("customer_id", ("Id",), None),
+    ("display_name", ("DisplayName",), None),
+    ("company_name", ("CompanyName",), None),
+    ("given_name", ("GivenName",), None),
+    ("family_name", ("FamilyName",), None),
+    ("email", ("PrimaryEmailAddr", "Address"), None),
+    ("phone", ("PrimaryPhone", "FreeFormNumber"), None),
+    ("billing_city", ("BillAddr", "City"), None),
+    ("billing_state", ("BillAddr", "CountrySubDivisionCode"), None),
+    ("billing_postal_code", ("BillAddr", "PostalCode"), None),
+    ("is_job", ("Job",), False),
+    ("is_active", ("Active",), True),
+    ("balance", ("Balance",), 0),
+    ("parent_customer_id", ("ParentRef", "value"), None),
+)
+
+VENDOR_SCHEMA = (
+    ("vendor_id", ("Id",), None),
+    ("display_name", ("DisplayName",), None),
+    ("company_name", ("CompanyName",), None),
+    ("email", ("PrimaryEmailAddr", "Address"), None),
+    ("phone", ("PrimaryPhone", "FreeFormNumber"), None),
+    ("is_1099", ("Vendor1099",), False),
+    ("is_active", ("Active",), True),
+    ("balance", ("Balance",), 0),
+)
+
+ITEM_SCHEMA = (
+    ("item_id", ("Id",), None),
+    ("item_name", ("Name",), None),
+    ("description", ("Description",), None),
+    ("item_type", ("Type",), None),
+    ("unit_price", ("UnitPrice",), None),
+    ("purchase_cost", ("PurchaseCost",), None),
+    ("is_active", ("Active",), True),
+    ("income_account_id", ("IncomeAccountRef", "value"), None),
+    ("expense_account_id", ("ExpenseAccountRef", "value"), None),
+    ("track_qty", ("TrackQtyOnHand",), False),
+    ("qty_on_hand", ("QtyOnHand",), None),
+)
+
+EMPLOYEE_SCHEMA = (
+    ("employee_id", ("Id",), None),
+    ("display_name", ("DisplayName",), None),
+    ("given_name", ("GivenName",), None),
+    ("family_name", ("FamilyName",), None),
+    ("hired_date", ("HiredDate",), None),
+    ("is_active", ("Active",), True),
+)
+
+INVOICE_SCHEMA = (
+    ("invoice_id", ("Id",), None),
+    ("doc_number", ("DocNumber",), None),
+    ("txn_date", ("TxnDate",), None),
+    ("due_date", ("DueDate",), None),
+    ("customer_id", ("CustomerRef", "value"), None),
+    ("total_amount", ("TotalAmt",), None),
+    ("balance", ("Balance",), None),
+    ("total_tax", ("TxnTaxDetail", "TotalTax"), 0),
+    ("email_status", ("EmailStatus",), None),
+    ("print_status", ("PrintStatus",), None),
+)
+
+BILL_SCHEMA = (
+    ("bill_id", ("Id",), None),
+    ("txn_date", ("TxnDate",), None),
+    ("due_date", ("DueDate",), None),
+    ("vendor_id", ("VendorRef", "value"), None),
+    ("total_amount", ("TotalAmt",), None),
+    ("balance", ("Balance",), None),
+)
+
+PAYMENT_SCHEMA = (
+    ("payment_id", ("Id",), None),
+    ("txn_date", ("TxnDate",), None),
+    ("total_amount", ("TotalAmt",), None),
+    ("customer_id", ("CustomerRef", "value"), None),
+    ("deposit_to_account_id", ("DepositToAccountRef", "value"), None),
+    ("payment_method_id", ("PaymentMethodRef", "value"), None),
+    ("unapplied_amount", ("UnappliedAmt",), 0),
+)
+
+PURCHASE_SCHEMA = (
+    ("purchase_id", ("Id",), None),
+    ("txn_date", ("TxnDate",), None),
+    ("payment_type", ("PaymentType",), None),
+    ("total_amount", ("TotalAmt",), None),
+    ("account_id", ("AccountRef", "value"), None),
+    ("vendor_id", ("EntityRef", "value"), None),
+    ("vendor_type", ("EntityRef", "type"), None),
+    ("is_credit", ("Credit",), False),
+    ("doc_number", ("DocNumber",), None),
+)
+
+
+def _linked_invoice_id(record: dict):
+    """Return the first linked Invoice's TxnId, or None."""
+    return next(
+        (t["TxnId"] for t in record.get("LinkedTxn", ()) if t.get("TxnType") == "Invoice"),
+        None,
+    )
+
+
+ESTIMATE_SCHEMA = (
+    ("estimate_id", ("Id",), None),
+    ("doc_number", ("DocNumber",), None),
+    ("txn_date", ("TxnDate",), None),
+    ("customer_id", ("CustomerRef", "value"), None),
+    ("total_amount", ("TotalAmt",), None),
+    ("txn_status", ("TxnStatus",), None),
+    ("linked_invoice_id", _linked_invoice_id, None),
+)
+
+
+def _map_records(schema: tuple, records: list[dict]) -> pd.DataFrame:
+    """Build a frame with one column per schema entry, one row per record."""
     if not records:
         return pd.DataFrame()
-    df = pd.DataFrame(records)
-    return pd.DataFrame({
-        "account_id": df["Id"],
-        "account_name": df["Name"],
-        "fully_qualified_name": df["FullyQualifiedName"],
-        "classification": df.get("Classification"),
-        "account_type": df.get("AccountType"),
-        "account_sub_type": df.get("AccountSubType"),
-        "is_sub_account": df.get("SubAccount", False),
-        "parent_account_id": df.get("ParentRef.value")
-        if "ParentRef.value" in df.columns
-        else df.apply(
-            lambda r: r.get("ParentRef", {}).get("value") if isinstance(r.get("ParentRef"), dict) else None,
-            axis=1,
-        ),
-        "is_active": df.get("Active", True),
-        "current_balance": df.get("CurrentBalance", 0),
-        "currency_code": df.apply(
-            lambda r: r.get("CurrencyRef", {}).get("value", "USD") if isinstance(r.get("CurrencyRef"), dict) else "USD",
-            axis=1,
-        ),
-    })
+    return pd.DataFrame(_compile_mapper(schema)(records))
+
+
+@lru_cache(maxsize=None)
+def _compile_mapper(schema: tuple):
+    """Generate a column-building function specialized to a mapper schema.
+
+    Each key path is inlined as straight-line .get() calls, so nothing is
+    looked up in the schema per record. A missing or non-dict intermediate
+    value (e.g. an absent or null ref) yields the entry's default; a null
+    final value is kept as-is.
+
+    The generated mapper(records, append_lines=None, lines=None) returns
+    {column: values}. If append_lines is given it is also called as
+    append_lines(lines, record) for each record, so map_and_flatten can
+    flatten line items in the same pass.
+    """
+    namespace = {}
+    body = []
+    for i, (_, path, default) in enumerate(schema):
+        namespace[f"d{i}"] = default
+        if callable(path):
+            namespace[f"f{i}"] = path
+            body.append(f"a{i}(f{i}(r))")
+            continue
+        body.append(f"v = r.get({path[0]!r}, d{i})")
+        for key in path[1:]:
+            body.append(f"v = v.get({key!r}, d{i}) if isinstance(v, dict) else d{i}")
+        body.append(f"a{i}(v)")
+    columns = ", ".join(f"{col!r}: c{i}" for i, (col, _, _) in enumerate(schema))
+    source = "\n".join([
+        "def mapper(records, append_lines=None, lines=None):",
+        *(f"    c{i} = []; a{i} = c{i}.append" for i in range(len(schema))),
+        "    for r in records:",
+        *(f"        {line}" for line in body),
+        "        if append_lines is not None:",
+        "            append_lines(lines, r)",
+        f"    return {{{columns}}}",
+    ])
+    exec(compile(source, "<schema_mapper>", "exec"), namespace)
+    return namespace["mapper"]
+
+
+def map_account(records: list[dict]) -> pd.DataFrame:
+    """Map Account records to dim_account schema."""
+    return _map_records(ACCOUNT_SCHEMA, records)
 
 
 def map_customer(records: list[dict]) -> pd.DataFrame:
-    if not records:
-        return pd.DataFrame()
-    rows = []
-    for r in records:
-        bill = r.get("BillAddr", {}) or {}
-        rows.append({
-            "customer_id": r.get("Id"),
-            "display_name": r.get("DisplayName"),
-            "company_name": r.get("CompanyName"),
-            "given_name": r.get("GivenName"),
-            "family_name": r.get("FamilyName"),
-            "email": (r.get("PrimaryEmailAddr") or {}).get("Address"),
-            "phone": (r.get("PrimaryPhone") or {}).get("FreeFormNumber"),
-            "billing_city": bill.get("City"),
-            "billing_state": bill.get("CountrySubDivisionCode"),
-            "billing_postal_code": bill.get("PostalCode"),
-            "is_job": r.get("Job", False),
-            "is_active": r.get("Active", True),
-            "balance": r.get("Balance", 0),
-            "parent_customer_id": (r.get("ParentRef") or {}).get("value"),
-        })
-    return pd.DataFrame(rows)
+    return _map_records(CUSTOMER_SCHEMA, records)
 
 
 def map_vendor(records: list[dict]) -> pd.DataFrame:
-    if not records:
-        return pd.DataFrame()
-    rows = []
-    for r in records:
-        rows.append({
-            "vendor_id": r.get("Id"),
-            "display_name": r.get("DisplayName"),
-            "company_name": r.get("CompanyName"),
-            "email": (r.get("PrimaryEmailAddr") or {}).get("Address"),
-            "phone": (r.get("PrimaryPhone") or {}).get("FreeFormNumber"),
-            "is_1099": r.get("Vendor1099", False),
-            "is_active": r.get("Active", True),
-            "balance": r.get("Balance", 0),
-        })
-    return pd.DataFrame(rows)
+    return _map_records(VENDOR_SCHEMA, records)
 
 
 def map_item(records: list[dict]) -> pd.DataFrame:
-    if not records:
-        return pd.DataFrame()
-    rows = []
-    for r in records:
-        rows.append({
-            "item_id": r.get("Id"),
-            "item_name": r.get("Name"),
-            "description": r.get("Description"),
-            "item_type": r.get("Type"),
-            "unit_price": r.get("UnitPrice"),
-            "purchase_cost": r.get("PurchaseCost"),
-            "is_active": r.get("Active", True),
-            "income_account_id": (r.get("IncomeAccountRef") or {}).get("value"),
-            "expense_account_id": (r.get("ExpenseAccountRef") or {}).get("value"),
-            "track_qty": r.get("TrackQtyOnHand", False),
-            "qty_on_hand": r.get("QtyOnHand"),
-        })
-    return pd.DataFrame(rows)
+    return _map_records(ITEM_SCHEMA, records)
 
 
 def map_employee(records: list[dict]) -> pd.DataFrame:
-    if not records:
-        return pd.DataFrame()
-    rows = []
-    for r in records:
-        rows.append({
-            "employee_id": r.get("Id"),
-            "display_name": r.get("DisplayName"),
-            "given_name": r.get("GivenName"),
-            "family_name": r.get("FamilyName"),
-            "hired_date": r.get("HiredDate"),
-            "is_active": r.get("Active", True),
-        })
-    return pd.DataFrame(rows)
+    return _map_records(EMPLOYEE_SCHEMA, records)
 
 
 def map_invoice(records: list[dict]) -> pd.DataFrame:
     """Map Invoice records to fact_invoice (header level, one row per invoice)."""
-    if not records:
-        return pd.DataFrame()
-    rows = []
-    for r in records:
-        tax_detail = r.get("TxnTaxDetail", {}) or {}
-        rows.append({
-            "invoice_id": r.get("Id"),
-            "doc_number": r.get("DocNumber"),
-            "txn_date": r.get("TxnDate"),
-            "due_date": r.get("DueDate"),
-            "customer_id": (r.get("CustomerRef") or {}).get("value"),
-            "total_amount": r.get("TotalAmt"),
-            "balance": r.get("Balance"),
-            "total_tax": tax_detail.get("TotalTax", 0),
-            "email_status": r.get("EmailStatus"),
-            "print_status": r.get("PrintStatus"),
-        })
-    return pd.DataFrame(rows)
+    return _map_records(INVOICE_SCHEMA, records)
 
 
 def map_bill(records: list[dict]) -> pd.DataFrame:
     """Map Bill records to fact_bill (header level)."""
-    if not records:
-        return pd.DataFrame()
-    rows = []
-    for r in records:
-        rows.append({
-            "bill_id": r.get("Id"),
-            "txn_date": r.get("TxnDate"),
-            "due_date": r.get("DueDate"),
-            "vendor_id": (r.get("VendorRef") or {}).get("value"),
-            "total_amount": r.get("TotalAmt"),
-            "balance": r.get("Balance"),
-        })
-    return pd.DataFrame(rows)
+    return _map_records(BILL_SCHEMA, records)
 
 
 def map_payment(records: list[dict]) -> pd.DataFrame:
     """Map Payment records to fact_payment (header level)."""
-    if not records:
-        return pd.DataFrame()
-    rows = []
-    for r in records:
-        rows.append({
-            "payment_id": r.get("Id"),
-            "txn_date": r.get("TxnDate"),
-            "total_amount": r.get("TotalAmt"),
-            "customer_id": (r.get("CustomerRef") or {}).get("value"),
-            "deposit_to_account_id": (r.get("DepositToAccountRef") or {}).get("value"),
-            "payment_method_id": (r.get("PaymentMethodRef") or {}).get("value"),
-            "unapplied_amount": r.get("UnappliedAmt", 0),
-        })
-    return pd.DataFrame(rows)
+    return _map_records(PAYMENT_SCHEMA, records)
 
 
 def map_purchase(records: list[dict]) -> pd.DataFrame:
     """Map Purchase records to fact_purchase (header level)."""
-    if not records:
-        return pd.DataFrame()
-    rows = []
-    for r in records:
-        rows.append({
-            "purchase_id": r.get("Id"),
-            "txn_date": r.get("TxnDate"),
-            "payment_type": r.get("PaymentType"),
-            "total_amount": r.get("TotalAmt"),
-            "account_id": (r.get("AccountRef") or {}).get("value"),
-            "vendor_id": (r.get("EntityRef") or {}).get("value"),
-            "vendor_type": (r.get("EntityRef") or {}).get("type"),
-            "is_credit": r.get("Credit", False),
-            "doc_number": r.get("DocNumber"),
-        })
-    return pd.DataFrame(rows)
+    return _map_records(PURCHASE_SCHEMA, records)
 
 
 def map_estimate(records: list[dict]) -> pd.DataFrame:
-    if not records:
-        return pd.DataFrame()
-    rows = []
-    for r in records:
-        linked = r.get("LinkedTxn", [])
-        rows.append({
-            "estimate_id": r.get("Id"),
-            "doc_number": r.get("DocNumber"),
-            "txn_date": r.get("TxnDate"),
-            "customer_id": (r.get("CustomerRef") or {}).get("value"),
-            "total_amount": r.get("TotalAmt"),
-            "txn_status": r.get("TxnStatus"),
-            "linked_invoice_id": next(
-                (t["TxnId"] for t in linked if t.get("TxnType") == "Invoice"),
-                None,
-            ),
-        })
-    return pd.DataFrame(rows)
+    return _map_records(ESTIMATE_SCHEMA, records)
 
 
 def map_generic_dimension(records: list[dict], id_field: str = "Id", name_field: str = "Name") -> pd.DataFrame:
     """Generic mapper for simple dimension tables (Class, Department, Term, etc.)."""
     if not records:
         return pd.DataFrame()
-    rows = []
-    for r in records:
-        rows.append({
-            "id": r.get(id_field),
-            "name": r.get(name_field),
-            "fully_qualified_name": r.get("FullyQualifiedName", r.get(name_field)),
-            "is_active": r.get("Active", True),
-        })
-    return pd.DataFrame(rows)
-
-
-# Registry mapping table names to their mapper functions
-MAPPER_REGISTRY = {
+    names = [r.get(name_field) for r in records]
+    return pd.DataFrame({
+        "id": [r.get(id_field) for r in records],
+        "name": names,
+        "fully_qualified_name": [r.get("FullyQualifiedName", n) for r, n in zip(records, names)],
+        "is_active": [r.get("Active", True) for r in records],
+    })
+
+
+# Registry mapping table names to their mapper functions (read-only, so
+# _resolve can cache lookups)
+MAPPER_REGISTRY = MappingProxyType({
     "Account": map_account,
     "Customer": map_customer,
     "Vendor": map_vendor,
@@ -236,13 +279,111 @@ MAPPER_REGISTRY = {
     "Payment": map_payment,
     "Purchase": map_purchase,
     "Estimate": map_estimate,
-}
+})
+
+
+# Transaction tables whose line items are flattened alongside the header:
+# table -> (header schema, line column names, per-record line appender)
+FLATTEN_REGISTRY = MappingProxyType({
+    "Invoice": (INVOICE_SCHEMA, INVOICE_LINE_COLUMNS, append_invoice_lines),
+    "Bill": (BILL_SCHEMA, BILL_LINE_COLUMNS, append_bill_lines),
+    "Payment": (PAYMENT_SCHEMA, PAYMENT_LINE_COLUMNS, append_payment_lines),
+    "Purchase": (PURCHASE_SCHEMA, PURCHASE_LINE_COLUMNS, append_purchase_lines),
+    "Estimate": (ESTIMATE_SCHEMA, ESTIMATE_LINE_COLUMNS, append_estimate_lines),
+})
+
+
+def map_and_flatten(table: str, records: list[dict],
+                    parallel: bool = False) -> tuple[pd.DataFrame, pd.DataFrame | None]:
+    """Map header rows and flatten line items in a single pass over records.
+
+    Returns (header_df, lines_df). lines_df is None for tables without line
+    items; either frame is empty if there are no rows. Output matches
+    map_to_schema plus the table's flatten_*_lines function. With
+    parallel=True the records are mapped in worker processes (see _map_shards).
+    """
+    if not parallel:
+        return _map_and_flatten(table, records)
+    results = _map_shards(partial(_map_and_flatten, table), records)
+    header = _concat([h for h, _ in results])
+    if results[0][1] is None:
+        return header, None
+    return header, _concat([lines for _, lines in results])
+
+
+def _map_and_flatten(table: str, records: list[dict]) -> tuple[pd.DataFrame, pd.DataFrame | None]:
+    spec = FLATTEN_REGISTRY.get(table)
+    if spec is None:
+        return map_to_schema(table, records), None
+    if not records:
+        return pd.DataFrame(), pd.DataFrame()
+
+    schema, line_names, append_lines = spec
+    lines = new_columns(line_names)
+    header = _compile_mapper(schema)(records, append_lines, lines)
+    return pd.DataFrame(header), frame_from_columns(lines)
+
+
+def iter_map_and_flatten(table: str, records: list[dict], chunk_size: int,
+                         parallel_min_records: int = 0):
+    """Yield map_and_flatten results for successive chunks of records.
+
+    Line-item tables are split into chunks of chunk_size records so only
+    one chunk's header and line frames are alive at a time; other tables
+    (and chunk_size <= 0) are mapped in one piece. Chunks of at least
+    parallel_min_records records are mapped in worker processes (0 never).
+    """
+    if chunk_size <= 0 or table not in FLATTEN_REGISTRY:
+        chunk_size = max(len(records), 1)
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        parallel = 0 < parallel_min_records <= len(chunk)
+        yield map_and_flatten(table, chunk, parallel=parallel)
+
+
+def map_to_schema(table: str, records: list[dict], parallel: bool = False) -> pd.DataFrame:
+    """Map raw QBO records to star schema using the appropriate mapper.
+
+    With parallel=True the records are mapped in worker processes
+    (see _map_shards).
+    """
+    if parallel:
+        return _concat(_map_shards(partial(_map_table, table), records))
+    return _map_table(table, records)
+
+
+def _map_table(table: str, records: list[dict]) -> pd.DataFrame:
+    return _resolve(table)(records)
+
+
+def _map_shards(fn, records: list[dict], workers: int = None) -> list:
+    """Apply fn to contiguous shards of records in separate processes.
+
+    fn must be picklable (a module-level function or a partial of one).
+    Records are pickled to the workers, so callers only ask for this on
+    large lists. Shards are contiguous, so concatenating the results in
+    order matches a single-process run.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(records))
+    if workers <= 1:
+        return [fn(records)]
+    size = -(-len(records) // workers)
+    shards = [records[i:i + size] for i in range(0, len(records), size)]
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        return list(pool.map(fn, shards))
+
+
+def _concat(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate shard results, skipping shards that produced no rows."""
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
 
 
-def map_to_schema(table: str, records: list[dict]) -> pd.DataFrame:
-    """Map raw QBO records to star schema using the appropriate mapper."""
-    mapper = MAPPER_REGISTRY.get(table)
-    if mapper:
-        return mapper(records)
-    # Fallback to generic dimension mapping for simple tables
-    return map_generic_dimension(records)
+@lru_cache(maxsize=None)
+def _resolve(table: str):
+    """Return the mapper for a table, falling back to the generic dimension mapper."""
+    return MAPPER_REGISTRY.get(table, map_generic_dimension)